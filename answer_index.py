@@ -0,0 +1,97 @@
+"""
+    题目模糊匹配索引：
+    题目去掉标点、空白并全角转半角后切成字符二元组（bigram），建立倒排索引，
+    查询时按Jaccard相似度找最相近的题目
+
+    用前缀过滤保证速度：相似度不低于阈值t的题目，至少要包含查询中最稀有的
+    q - ceil(t*q) + 1 个二元组之一，只需要遍历这些稀有二元组的倒排表，
+    候选再按长度过滤后精确计算相似度，结果与全量比较一致
+"""
+import math
+import re
+import unicodedata
+from html import unescape
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def fuzzy_text(text):
+    """模糊匹配用的文本：反转义、全角转半角、小写，去掉标点和空白"""
+    text = unescape(text or '').replace('\xa0', ' ')
+    text = unicodedata.normalize('NFKC', text).lower()
+    return _NON_WORD_RE.sub('', text)
+
+
+def shingles(text, n=2):
+    """字符n元组集合，文本短于n时整体作为一个元组"""
+    text = fuzzy_text(text)
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class QuestionIndex:
+    """题目文本的n元组倒排索引"""
+
+    def __init__(self, n=2):
+        self.n = n
+        self.token_ids = {}   # 元组 -> 整数编号
+        self.postings = []    # 编号 -> [文档id]
+        self.docs = {}        # 文档id -> 排序后的元组编号
+        self.texts = {}       # 文档id -> 原题目
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, text):
+        tokens = shingles(text, self.n)
+        if not tokens or doc_id in self.docs:
+            return
+        ids = []
+        for token in tokens:
+            token_id = self.token_ids.get(token)
+            if token_id is None:
+                token_id = len(self.postings)
+                self.token_ids[token] = token_id
+                self.postings.append([])
+            self.postings[token_id].append(doc_id)
+            ids.append(token_id)
+        self.docs[doc_id] = tuple(sorted(ids))
+        self.texts[doc_id] = text
+
+    def search(self, text, threshold=0.8, limit=5):
+        """返回相似度不低于threshold的[(文档id, 相似度)]，按相似度从高到低排列"""
+        tokens = shingles(text, self.n)
+        if not tokens:
+            return []
+        query = set()
+        for token in tokens:
+            token_id = self.token_ids.get(token)
+            # 索引中不存在的元组用负数占位，只影响并集大小
+            query.add(token_id if token_id is not None else -1 - len(query))
+        size = len(query)
+        overlap_needed = math.ceil(threshold * size)
+        if overlap_needed <= 0:
+            return []
+
+        # 前缀过滤：按倒排表长度从短到长取前 size - overlap_needed + 1 个元组，
+        # 索引中不存在的元组倒排表为空，排在最前面
+        known = sorted((token_id for token_id in query if token_id >= 0), key=lambda token_id: len(self.postings[token_id]))
+        prefix_len = size - overlap_needed + 1 - (size - len(known))
+        candidates = set()
+        for token_id in known[:max(0, prefix_len)]:
+            candidates.update(self.postings[token_id])
+
+        min_len = threshold * size
+        max_len = size / threshold
+        results = []
+        for doc_id in candidates:
+            doc = self.docs[doc_id]
+            if not min_len <= len(doc) <= max_len:
+                continue
+            common = len(query.intersection(doc))
+            score = common / (size + len(doc) - common)
+            if score >= threshold:
+                results.append((doc_id, score))
+        results.sort(key=lambda item: -item[1])
+        return results[:limit]
@@ -0,0 +1,168 @@
+"""
+    答题策略路由：
+    按顺序尝试各个答题策略（答案缓存、模糊匹配、排除法、本地排序、大模型），
+    第一个给出置信度不低于阈值的答案的策略胜出，后面的策略不再执行；
+    都达不到阈值时取置信度最高的答案
+
+    每个策略的耗时和答对/答错结果保存在答案库的strategy_stats表中，取最近若干次计算
+    滚动平均耗时和准确率：
+    - 样本足够时，策略的置信度不超过它的历史准确率
+    - 开启自动排序时，准确率达到目标的策略按平均耗时从低到高排在前面，
+      其余按准确率从高到低排在后面，从而在满足目标准确率的前提下尽量少花时间；
+      只在样本足够的策略之间调整顺序，样本不足的策略保持配置中的位置
+"""
+import time
+from collections import deque
+from datetime import datetime
+
+# 滚动统计的窗口大小
+WINDOW = 50
+# 样本数不少于该值时才用历史准确率修正置信度和排序
+MIN_SAMPLES = 5
+
+
+class StrategyStats:
+    """单个策略最近的耗时和答题结果"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW)
+        self.outcomes = deque(maxlen=WINDOW)
+
+    @property
+    def latency(self):
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    @property
+    def accuracy(self):
+        """历史准确率，样本不足时返回None"""
+        if len(self.outcomes) < MIN_SAMPLES:
+            return None
+        return sum(self.outcomes) / len(self.outcomes)
+
+
+class AnswerRouter:
+    """按顺序执行答题策略，策略为 名称 -> 函数(context)，函数返回(选项ID, 置信度)或(None, 0)"""
+
+    def __init__(self, strategies, order, confidence=0.9, auto_order=True, conn=None):
+        unknown = [name for name in order if name not in strategies]
+        if unknown:
+            raise ValueError(f"未知的答题策略: {', '.join(unknown)}，可用策略: {', '.join(strategies)}")
+        self.strategies = strategies
+        self.order = list(order)
+        self.confidence = confidence
+        self.auto_order = auto_order
+        self.conn = conn
+        self.stats = {name: StrategyStats() for name in strategies}
+        # 本次运行各策略胜出的次数
+        self.wins = {name: 0 for name in strategies}
+        # 最近一次作答的策略，等待答题结果
+        self.pending = None
+        if conn is not None:
+            self._load()
+
+    def _load(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS strategy_stats (
+                strategy TEXT NOT NULL,
+                latency REAL NOT NULL,
+                correct INTEGER,
+                created TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_strategy_stats ON strategy_stats (strategy, created)")
+        for name, stats in self.stats.items():
+            rows = self.conn.execute(
+                "SELECT latency, correct FROM strategy_stats WHERE strategy = ? ORDER BY rowid DESC LIMIT ?",
+                (name, WINDOW * 4)
+            ).fetchall()
+            for latency, correct in reversed(rows):
+                stats.latencies.append(latency)
+                if correct is not None:
+                    stats.outcomes.append(correct)
+        self.conn.commit()
+
+    def _save(self, name, latency, correct=None):
+        if self.conn is None:
+            return
+        self.conn.execute(
+            "INSERT INTO strategy_stats (strategy, latency, correct, created) VALUES (?, ?, ?, ?)",
+            (name, latency, correct, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.conn.commit()
+
+    def effective_order(self):
+        """当前使用的策略顺序"""
+        if not self.auto_order:
+            return list(self.order)
+
+        def key(name):
+            stats = self.stats[name]
+            accuracy = stats.accuracy
+            if accuracy >= self.confidence:
+                return (0, stats.latency, self.order.index(name))
+            return (1, -accuracy, self.order.index(name))
+
+        # 样本足够的策略排序后依次填回它们原来占的位置，样本不足的策略（如新启用的llm）不动，
+        # 避免还没有准确率的慢策略因为耗时未知排到已验证的缓存策略前面
+        ranked = iter(sorted((name for name in self.order if self.stats[name].accuracy is not None), key=key))
+        return [next(ranked) if self.stats[name].accuracy is not None else name for name in self.order]
+
+    def route(self, context):
+        """依次执行策略，返回(选项ID, 策略名, 置信度)，所有策略都没有答案时返回(None, None, 0)"""
+        best = (None, None, 0.0, 0.0)
+        self.pending = None
+        for name in self.effective_order():
+            start = time.time()
+            try:
+                label, confidence = self.strategies[name](context)
+            except Exception as e:
+                print(f"[警告] 答题策略 {name} 执行失败: {e}")
+                label, confidence = None, 0.0
+            latency = time.time() - start
+            self.stats[name].latencies.append(latency)
+            if not label:
+                self._save(name, latency)
+                continue
+
+            accuracy = self.stats[name].accuracy
+            if accuracy is not None:
+                confidence = min(confidence, accuracy)
+            print(f"[调试] 答题策略 {name}: {label}，置信度 {confidence:.2f}，耗时 {latency:.3f} 秒")
+            # 当前策略的耗时记录等待答题结果后再保存
+            if confidence > best[2] or best[0] is None:
+                if best[0] is not None:
+                    self._save(best[1], best[3])
+                best = (label, name, confidence, latency)
+            else:
+                self._save(name, latency)
+            if confidence >= self.confidence:
+                break
+
+        if best[0] is None:
+            return None, None, 0.0
+        label, name, confidence, latency = best
+        self.wins[name] += 1
+        self.pending = (name, latency)
+        return label, name, confidence
+
+    def record_outcome(self, is_correct):
+        """记录最近一次作答的结果（None表示结果未知），计入对应策略的准确率"""
+        if self.pending is None:
+            return
+        name, latency = self.pending
+        self.pending = None
+        if is_correct is None:
+            self._save(name, latency)
+            return
+        self.stats[name].outcomes.append(1 if is_correct else 0)
+        self._save(name, latency, 1 if is_correct else 0)
+
+    def summary(self):
+        """各策略本次胜出次数和滚动统计，用于推送日志"""
+        parts = []
+        for name in self.order:
+            stats = self.stats[name]
+            accuracy = stats.accuracy
+            accuracy_text = f"{accuracy:.0%}" if accuracy is not None else "样本不足"
+            parts.append(f"{name}{self.wins[name]}次(准确率{accuracy_text}，平均{stats.latency:.2f}秒)")
+        return "答题策略：" + "，".join(parts) + "。"
@@ -0,0 +1,670 @@
+"""
+    答案缓存 / 题库：
+    用本地SQLite保存答过的题目，键为规范化后的题目文本和排序后的选项文本的哈希，
+    记录确认正确的选项和已知错误的选项，答题前先查缓存，命中正确答案时不再调用大模型
+
+    预热任务（warm_cache.py）提前让大模型答好的答案单独保存为“预答”，答错后作废
+
+    答案按选项文本保存，查询时再映射回当前页面的选项ID（a1~a4），
+    论坛打乱选项顺序后仍然能直接复用；题目文本精确匹配不到时，
+    再用answer_index的n元组索引查找相似度超过阈值的近似题目
+
+    取代原来的wrong.txt（整文件正则替换）和wrong.json（整文件读写、线性查找），
+    查询走主键/索引，写入为单行upsert，关闭时按空闲页比例做压缩
+
+    旧数据一次性导入：
+    python answer_store.py migrate wrong.json wrong.txt
+    大题库（JSON数组或JSONL，每条包含question、options，可选correct_answer/wrong_answer）流式导入：
+    python answer_store.py import corpus.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import datetime
+try:
+    import resource
+except ImportError:
+    resource = None
+from html import unescape
+from answer_index import QuestionIndex
+
+# 空闲页超过该比例时关闭数据库前执行VACUUM
+COMPACT_RATIO = 0.25
+# 流式导入时每个事务写入的题目数
+IMPORT_BATCH = 10000
+# 流式读取时单条记录的最大长度（字符）：超过仍解析不出来时认为文件损坏，不再继续缓冲
+MAX_ENTRY_SIZE = 16 << 20
+# 建立索引时每次读取的行数：分批读取，后台建立索引时不会长时间占住读锁、阻塞答题记录的写入
+SCAN_BATCH = 10000
+# 写入答案的upsert语句
+UPSERT_SQL = """
+    INSERT INTO answers (key, qkey, question, options, correct, wrong, updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        options = excluded.options,
+        correct = excluded.correct,
+        wrong = excluded.wrong,
+        updated = excluded.updated
+"""
+# 否定词：近似题目只差一个否定词时答案往往相反（“是首都”/“不是首都”相似度约0.84），
+# 两道题中各否定词出现的次数不同时不作为近似题目
+NEGATION_MARKERS = ('不正确', '错误', '不', '非')
+# 数据库格式版本：0 按选项ID保存答案，1 按选项文本保存答案，2 增加预答列
+SCHEMA_VERSION = 2
+
+
+def normalize_text(text):
+    """规范化文本：反转义HTML实体、全角转半角、合并空白"""
+    text = unescape(text or '').replace('\xa0', ' ')
+    text = unicodedata.normalize('NFKC', text)
+    return ' '.join(text.split())
+
+
+def negations(text):
+    """各否定词在题目中出现的次数"""
+    return tuple(text.count(marker) for marker in NEGATION_MARKERS)
+
+
+def _hash(raw):
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def question_key(question_text, options_dict):
+    """题目的缓存键：规范化题目 + 排序后的规范化选项文本"""
+    options = sorted(normalize_text(text) for text in options_dict.values())
+    return _hash(normalize_text(question_text) + '\n' + '\n'.join(options))
+
+
+def question_only_key(question_text):
+    """只按题目文本的键，用于匹配旧错题本中选项不完整的记录"""
+    return _hash(normalize_text(question_text))
+
+
+def iter_rows(conn, columns, batch_size=SCAN_BATCH):
+    """按rowid分批读取answers表，每批是单独的短查询，返回(rowid, *columns)"""
+    last = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT rowid, {', '.join(columns)} FROM answers WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][0]
+
+
+class AnswerStore:
+    """基于SQLite的答案缓存"""
+
+    def __init__(self, path='answers.db', fuzzy_threshold=0.8):
+        self.path = path
+        # 模糊匹配的相似度阈值，0表示关闭；索引在第一次需要时才建立
+        self.fuzzy_threshold = fuzzy_threshold
+        self.index = None
+        # 后台建立索引的线程，以及建立期间新写入、需要补进索引的题目
+        self.index_thread = None
+        self.index_pending = []
+        self.index_lock = threading.Lock()
+        self.last_fuzzy_score = None
+        # 最近一次lookup查到的记录，未命中正确答案时用于排除已知错误选项
+        self.last_entry = None
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                qkey TEXT NOT NULL,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct TEXT,
+                wrong TEXT NOT NULL DEFAULT '[]',
+                updated TEXT NOT NULL,
+                suggested TEXT
+            )
+        """)
+        self._migrate()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_qkey ON answers (qkey)")
+        self.conn.commit()
+        # 本次运行的查询统计
+        self.lookups = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.suggestion_hits = 0
+
+    def _migrate(self):
+        """升级旧版数据库：补上qkey和suggested列，把按选项ID保存的答案转换为选项文本"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(answers)")]
+        if 'suggested' not in columns:
+            self.conn.execute("ALTER TABLE answers ADD COLUMN suggested TEXT")
+        if 'qkey' not in columns:
+            self.conn.execute("ALTER TABLE answers ADD COLUMN qkey TEXT NOT NULL DEFAULT ''")
+            rows = self.conn.execute("SELECT key, question FROM answers").fetchall()
+            self.conn.executemany(
+                "UPDATE answers SET qkey = ? WHERE key = ?",
+                [(question_only_key(question), key) for key, question in rows]
+            )
+        
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            updates = []
+            for key, options, correct, wrong in self.conn.execute("SELECT key, options, correct, wrong FROM answers"):
+                options_dict = json.loads(options)
+                correct_text = normalize_text(options_dict[correct]) if correct in options_dict else None
+                wrong_texts = sorted(normalize_text(options_dict[label]) for label in json.loads(wrong) if label in options_dict)
+                updates.append((correct_text, json.dumps(wrong_texts, ensure_ascii=False), key))
+            self.conn.executemany("UPDATE answers SET correct = ?, wrong = ? WHERE key = ?", updates)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def get_texts(self, question_text, options_dict, fuzzy=True):
+        """读取题目记录中的答案文本，返回(正确选项文本或None, [错误选项文本])，没有记录返回None"""
+        self.last_fuzzy_score = None
+        row = self.conn.execute(
+            "SELECT correct, wrong FROM answers WHERE key = ?",
+            (question_key(question_text, options_dict),)
+        ).fetchone()
+        if row is None:
+            row = self._get_partial(question_text, options_dict)
+        if row is None and fuzzy:
+            row = self._get_fuzzy(question_text, options_dict)
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _get_partial(self, question_text, options_dict):
+        """按题目文本查找选项不完整的记录（旧错题本导入），记录中的选项文本要能在当前选项中找到"""
+        current = set(normalize_text(text) for text in options_dict.values())
+        rows = self.conn.execute(
+            "SELECT correct, wrong FROM answers WHERE qkey = ? ORDER BY updated DESC",
+            (question_only_key(question_text),)
+        ).fetchall()
+        for correct, wrong in rows:
+            texts = json.loads(wrong) + ([correct] if correct else [])
+            if texts and all(text in current for text in texts):
+                return correct, wrong
+        return None
+
+    def _build_index(self, conn=None):
+        start = time.time()
+        index = QuestionIndex()
+        for rowid, question in iter_rows(conn or self.conn, ('question',)):
+            index.add(rowid, question)
+        with self.index_lock:
+            for rowid, question in self.index_pending:
+                index.add(rowid, question)
+            self.index_pending = []
+            self.index = index
+        print(f"[调试] 模糊匹配索引已建立: {len(index)} 道题，耗时 {time.time() - start:.2f} 秒")
+
+    def build_index_async(self):
+        """
+        在后台线程中用单独的连接建立模糊匹配索引：题库很大时建立索引需要几十秒，
+        放在登录、签到阶段提前进行，建立完成前的模糊查询直接跳过，不阻塞答题
+        """
+        if not self.fuzzy_threshold or self.index is not None or self.index_thread is not None:
+            return
+
+        def worker():
+            conn = sqlite3.connect(self.path)
+            try:
+                self._build_index(conn)
+            except Exception as e:
+                print(f"[警告] 后台建立模糊匹配索引失败: {e}")
+            finally:
+                conn.close()
+
+        self.index_thread = threading.Thread(target=worker, daemon=True)
+        self.index_thread.start()
+
+    def _get_fuzzy(self, question_text, options_dict):
+        """查找相似度超过阈值的近似题目，答案选项文本要能在当前选项中找到"""
+        if not self.fuzzy_threshold:
+            return None
+        if self.index is None:
+            if self.index_thread is not None:
+                print("[调试] 模糊匹配索引尚未建立完成，跳过模糊匹配")
+                return None
+            self._build_index()
+        current = set(normalize_text(text) for text in options_dict.values())
+        markers = negations(question_text)
+        for rowid, score in self.index.search(question_text, self.fuzzy_threshold):
+            question, correct, wrong = self.conn.execute(
+                "SELECT question, correct, wrong FROM answers WHERE rowid = ?", (rowid,)
+            ).fetchone()
+            if negations(question) != markers:
+                print(f"[调试] 跳过否定词不同的近似题目（相似度 {score:.2f}）: {question}")
+                continue
+            texts = json.loads(wrong) + ([correct] if correct else [])
+            if texts and all(text in current for text in texts):
+                print(f"[调试] 模糊匹配到题目（相似度 {score:.2f}）: {question}")
+                print(f"[调试]   正确选项: {correct}，错误选项: {json.loads(wrong)}")
+                self.last_fuzzy_score = score
+                return correct, wrong
+        return None
+
+    def get(self, question_text, options_dict, fuzzy=True):
+        """读取题目记录并映射为当前选项ID，返回{"correct": 标签或None, "wrong": [标签]}，没有记录返回None"""
+        texts = self.get_texts(question_text, options_dict, fuzzy)
+        if texts is None:
+            return None
+        return _to_labels(texts, options_dict)
+
+    def lookup(self, question_text, options_dict, fuzzy=True):
+        """答题前查询确认正确的答案，并计入命中统计"""
+        self.lookups += 1
+        entry = self.get(question_text, options_dict, fuzzy)
+        self.last_entry = entry
+        if entry and entry["correct"]:
+            self.hits += 1
+            if self.last_fuzzy_score is not None:
+                self.fuzzy_hits += 1
+            return entry["correct"]
+        return None
+
+    def lookup_fuzzy(self, question_text, options_dict):
+        """只按近似题目查询确认正确的答案，返回(选项ID, 相似度)，没有返回(None, 0)"""
+        self.last_fuzzy_score = None
+        row = self._get_fuzzy(question_text, options_dict)
+        if row is None:
+            return None, 0.0
+        entry = _to_labels((row[0], json.loads(row[1])), options_dict)
+        if not entry["correct"]:
+            return None, 0.0
+        self.hits += 1
+        self.fuzzy_hits += 1
+        return entry["correct"], self.last_fuzzy_score
+
+    def get_suggestion(self, question_text, options_dict):
+        """读取预热任务保存的预答并映射为当前选项ID，没有预答返回None"""
+        row = self.conn.execute(
+            "SELECT suggested FROM answers WHERE key = ?", (question_key(question_text, options_dict),)
+        ).fetchone()
+        if row is None or not row[0]:
+            return None
+        label = _to_labels((row[0], []), options_dict)["correct"]
+        if label:
+            self.suggestion_hits += 1
+        return label
+
+    def needs_answer(self, question_text, options_dict):
+        """题目是否既没有确认正确的答案也没有预答"""
+        row = self.conn.execute(
+            "SELECT correct, suggested FROM answers WHERE key = ?", (question_key(question_text, options_dict),)
+        ).fetchone()
+        return row is None or not (row[0] or row[1])
+
+    def suggest(self, question_text, options_dict, label, commit=True):
+        """保存大模型预答的选项文本，不影响已确认的正确/错误记录"""
+        if not question_text or label not in options_dict:
+            return
+        self.conn.execute(
+            """
+            INSERT INTO answers (key, qkey, question, options, updated, suggested)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET suggested = excluded.suggested
+            """,
+            (
+                question_key(question_text, options_dict),
+                question_only_key(question_text),
+                question_text,
+                json.dumps(options_dict, ensure_ascii=False),
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                normalize_text(options_dict[label]),
+            )
+        )
+        if commit:
+            self.conn.commit()
+
+    def record(self, question_text, options_dict, label, is_correct, timestamp=None, commit=True):
+        """根据答题结果更新记录：答对保存正确选项文本，答错加入错误选项文本"""
+        if not question_text or label not in options_dict:
+            return
+        text = normalize_text(options_dict[label])
+        # 只合并本题的记录（精确匹配或旧错题本的同题记录），近似题的答案不能写进本题
+        correct, wrong = self.get_texts(question_text, options_dict, fuzzy=False) or (None, [])
+        if is_correct:
+            correct = text
+            if text in wrong:
+                wrong.remove(text)
+        else:
+            if text not in wrong:
+                wrong.append(text)
+            if correct == text:
+                correct = None
+        self.conn.execute(
+            UPSERT_SQL,
+            (
+                question_key(question_text, options_dict),
+                question_only_key(question_text),
+                question_text,
+                json.dumps(options_dict, ensure_ascii=False),
+                correct,
+                json.dumps(sorted(wrong), ensure_ascii=False),
+                timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            )
+        )
+        if not is_correct:
+            # 预答被证明是错的，作废
+            self.conn.execute(
+                "UPDATE answers SET suggested = NULL WHERE key = ? AND suggested = ?",
+                (question_key(question_text, options_dict), text)
+            )
+        if self.index is not None or self.index_thread is not None:
+            rowid = self.conn.execute(
+                "SELECT rowid FROM answers WHERE key = ?", (question_key(question_text, options_dict),)
+            ).fetchone()[0]
+            with self.index_lock:
+                if self.index is not None:
+                    self.index.add(rowid, question_text)
+                else:
+                    self.index_pending.append((rowid, question_text))
+        if commit:
+            self.conn.commit()
+
+    def record_vote(self, model, label, latency, correct):
+        """记录多模型投票中一个模型的投票、耗时和对错（None表示无法判断）"""
+        self._create_votes_table()
+        self.conn.execute(
+            "INSERT INTO model_votes (model, label, latency, correct, created) VALUES (?, ?, ?, ?, ?)",
+            (model, label, latency, None if correct is None else int(correct),
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.conn.commit()
+
+    def model_weights(self, models, window=100):
+        """各模型的投票权重：最近window次可判断对错的投票的准确率（拉普拉斯平滑）"""
+        self._create_votes_table()
+        weights = {}
+        for model in models:
+            rows = self.conn.execute(
+                "SELECT correct FROM model_votes WHERE model = ? AND correct IS NOT NULL ORDER BY rowid DESC LIMIT ?",
+                (model, window)
+            ).fetchall()
+            weights[model] = (sum(row[0] for row in rows) + 1) / (len(rows) + 2)
+        return weights
+
+    def record_latency(self, model, latency):
+        """记录一次成功的大模型调用耗时，跨运行累积，用于计算对冲阈值"""
+        self._create_latency_table()
+        self.conn.execute(
+            "INSERT INTO api_latency (model, latency, created) VALUES (?, ?, ?)",
+            (model, latency, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.conn.commit()
+
+    def recent_latencies(self, model, window=200):
+        """该模型最近window次成功调用的耗时"""
+        self._create_latency_table()
+        rows = self.conn.execute(
+            "SELECT latency FROM api_latency WHERE model = ? ORDER BY rowid DESC LIMIT ?", (model, window)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _create_latency_table(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_latency (
+                model TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created TEXT NOT NULL
+            )
+        """)
+
+    def _create_votes_table(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS model_votes (
+                model TEXT NOT NULL,
+                label TEXT NOT NULL,
+                latency REAL NOT NULL,
+                correct INTEGER,
+                created TEXT NOT NULL
+            )
+        """)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def compact(self, force=False):
+        """空闲页比例超过阈值（或force）时执行VACUUM，返回是否压缩"""
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not force and (not page_count or freelist / page_count < COMPACT_RATIO):
+            return False
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        print(f"[调试] 答案库已压缩，释放 {freelist} 个空闲页")
+        return True
+
+    def summary(self):
+        """本次运行的命中情况，用于推送日志"""
+        rate = self.hits / self.lookups * 100 if self.lookups else 0
+        return (f"答案缓存命中{self.hits}/{self.lookups}（{rate:.0f}%，其中模糊匹配{self.fuzzy_hits}次），"
+                f"预答命中{self.suggestion_hits}次，节省API调用{self.hits + self.suggestion_hits}次。")
+
+    def close(self):
+        self.conn.commit()
+        self.compact()
+        self.conn.close()
+
+
+def _to_labels(texts, options_dict):
+    """把(正确选项文本, [错误选项文本])映射为当前页面的选项ID"""
+    correct_text, wrong_texts = texts
+    label_of = {normalize_text(text): label for label, text in options_dict.items()}
+    return {
+        "correct": label_of.get(correct_text) if correct_text else None,
+        "wrong": sorted(label_of[text] for text in wrong_texts if text in label_of),
+    }
+
+
+def iter_json_entries(path, chunk_size=1 << 20, max_entry_size=MAX_ENTRY_SIZE):
+    """
+    逐条读取JSON数组或JSONL文件中的记录，只缓冲当前一块文件内容，内存占用与文件大小无关
+    单条记录超过max_entry_size仍不完整、或文件在记录中间结束时抛出ValueError，给出记录开始的字节偏移
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size)
+        # 已经丢弃的内容的字节数，用于在错误中给出偏移
+        consumed = 3 if buffer.startswith('\ufeff') else 0
+        buffer = buffer.lstrip('\ufeff')
+        pos = 0
+        while True:
+            # 跳过记录之间的空白、逗号和数组的括号
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+                pos += 1
+            if pos == len(buffer):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                consumed += len(buffer.encode('utf-8'))
+                buffer, pos = chunk, 0
+                continue
+            try:
+                entry, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # 记录被块边界截断，读入下一块后重试
+                offset = consumed + len(buffer[:pos].encode('utf-8'))
+                if len(buffer) - pos >= max_entry_size:
+                    raise ValueError(f"{path}: 字节偏移 {offset} 处的记录超过 {max_entry_size} 字符仍不完整，"
+                                     f"文件可能已损坏: {e.msg}") from e
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"{path}: 字节偏移 {offset} 处的记录格式错误或不完整: {e.msg}") from e
+                consumed = offset
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            pos = end
+            yield entry
+
+
+def _flush_import(store, batch, stats):
+    """
+    把一批去重后的题目合并已有记录后在一个事务中写入：
+    已确认的正确答案不会被导入的数据覆盖，导入的正确答案与之不同、或把它标为错误选项时计入冲突
+    """
+    keys = list(batch)
+    existing = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for key, correct, wrong in store.conn.execute(
+                f"SELECT key, correct, wrong FROM answers WHERE key IN ({placeholders})", chunk):
+            existing[key] = (correct, json.loads(wrong))
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for key, (qkey, question_text, options_dict, correct, wrong) in batch.items():
+        if key in existing:
+            stats["merged"] += 1
+            old_correct, old_wrong = existing[key]
+            if old_correct:
+                if (correct and correct != old_correct) or old_correct in wrong:
+                    stats["conflicts"] += 1
+                correct = old_correct
+            wrong.update(old_wrong)
+        wrong.discard(correct)
+        rows.append((key, qkey, question_text, json.dumps(options_dict, ensure_ascii=False),
+                     correct, json.dumps(sorted(wrong), ensure_ascii=False), now))
+    with store.conn:
+        store.conn.executemany(UPSERT_SQL, rows)
+    stats["written"] += len(rows)
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def import_corpus(store, path, batch_size=IMPORT_BATCH):
+    """
+    流式导入题库文件：按题目和选项的内容哈希去重，同一道题的多条记录合并正确/错误选项，
+    每batch_size道题一个事务批量写入，返回统计；已确认的正确答案保留不变，冲突数计入conflicts
+    """
+    start = time.time()
+    stats = {"read": 0, "skipped": 0, "duplicates": 0, "merged": 0, "conflicts": 0, "written": 0}
+    batch = {}
+    # 导入中断时重新导入即可，不需要每个事务都等待落盘
+    store.conn.execute("PRAGMA synchronous = OFF")
+    for entry in iter_json_entries(path):
+        stats["read"] += 1
+        question_text = entry.get("question") if isinstance(entry, dict) else None
+        options_dict = entry.get("options") if question_text else None
+        if not question_text or not isinstance(options_dict, dict) or not options_dict:
+            stats["skipped"] += 1
+            continue
+        # 与question_key/question_only_key相同，但每段文本只规范化一次
+        question = normalize_text(question_text)
+        options = {label: normalize_text(str(text)) for label, text in options_dict.items()}
+        key = _hash(question + '\n' + '\n'.join(sorted(options.values())))
+        item = batch.get(key)
+        if item is None:
+            item = batch[key] = [_hash(question), question_text, options_dict, None, set()]
+        else:
+            stats["duplicates"] += 1
+        correct_label = entry.get("correct_answer")
+        wrong_label = entry.get("wrong_answer")
+        if correct_label in options:
+            item[3] = options[correct_label]
+        if wrong_label in options:
+            item[4].add(options[wrong_label])
+        if len(batch) >= batch_size:
+            _flush_import(store, batch, stats)
+            batch = {}
+    if batch:
+        _flush_import(store, batch, stats)
+    store.conn.execute("PRAGMA synchronous = FULL")
+
+    elapsed = time.time() - start
+    stats["seconds"] = elapsed
+    stats["rows_per_second"] = stats["read"] / elapsed if elapsed else 0
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return stats
+
+
+def import_wrong_json(store, path):
+    """导入wrong.json：每条记录是一道题的一个错误选项"""
+    count = 0
+    for entry in iter_json_entries(path):
+        question_text = entry.get("question")
+        label = entry.get("wrong_answer")
+        options_dict = entry.get("options") or {}
+        if not question_text or not label:
+            continue
+        store.record(question_text, options_dict, label, False, timestamp=entry.get("timestamp"), commit=False)
+        count += 1
+    store.conn.commit()
+    return count
+
+
+def import_wrong_txt(store, path):
+    """
+    导入wrong.txt：题目一行，下一行是"a1: 选项, a3: 选项"形式的答案行
+    旧格式无法区分答对后保留的单个答案，统一按错误选项导入，选项只包含答案行里出现的部分
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    answer_line_re = re.compile(r'^a[1-4]: ')
+    answer_re = re.compile(r'(a[1-4]): (.*?)(?=, a[1-4]: |$)')
+    count = 0
+    question_text = None
+    for line in lines:
+        if question_text and answer_line_re.match(line):
+            options_dict = dict(answer_re.findall(line))
+            for label in sorted(options_dict):
+                store.record(question_text, options_dict, label, False, commit=False)
+                count += 1
+            question_text = None
+        elif line.strip():
+            question_text = line
+    store.conn.commit()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default=os.environ.get('ANSWER_DB', 'answers.db'), help='SQLite answer store path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='One-shot import of wrong.json / wrong.txt')
+    migrate_parser.add_argument('files', nargs='+', help='wrong.json or wrong.txt files')
+    import_parser = subparsers.add_parser('import', help='Stream-import a large JSON array / JSONL question corpus')
+    import_parser.add_argument('files', nargs='+', help='corpus files (question, options, correct_answer, wrong_answer)')
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH, help='questions per transaction')
+    subparsers.add_parser('compact', help='VACUUM the answer store')
+    args = parser.parse_args()
+
+    store = AnswerStore(args.db)
+    if args.command == 'migrate':
+        for path in args.files:
+            if path.endswith('.json'):
+                count = import_wrong_json(store, path)
+            else:
+                count = import_wrong_txt(store, path)
+            print(f"已从 {path} 导入 {count} 条记录")
+        print(f"答案库共 {store.count()} 道题")
+    elif args.command == 'import':
+        for path in args.files:
+            try:
+                stats = import_corpus(store, path, args.batch_size)
+            except ValueError as e:
+                print(f"[错误] 导入中止，此前的批次已写入: {e}")
+                break
+            peak = f"{stats['peak_rss_mb']:.0f}MB" if stats['peak_rss_mb'] is not None else "未知"
+            print(f"已从 {path} 读取 {stats['read']} 条记录，写入 {stats['written']} 道题"
+                  f"（文件内重复 {stats['duplicates']}，与已有记录合并 {stats['merged']}，与已确认答案冲突 {stats['conflicts']}，跳过 {stats['skipped']}），"
+                  f"耗时 {stats['seconds']:.1f} 秒，{stats['rows_per_second']:.0f} 条/秒，峰值内存 {peak}")
+        print(f"答案库共 {store.count()} 道题")
+    elif args.command == 'compact':
+        store.compact(force=True)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
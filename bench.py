@@ -0,0 +1,440 @@
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+import requests
+from datetime import datetime
+from functools import partial
+from page_parser import AVAILABLE_BACKENDS, extract_fields, parse_html, parse_question
+from answer_store import AnswerStore, normalize_text, question_key, question_only_key
+from answer_index import QuestionIndex
+from local_ranker import LocalRanker
+
+"""
+    微基准：
+    parse: 对保存下来的页面（默认是脚本失败时保存的failure_*.html）分别用
+           各个已安装的完整解析后端和快速字段提取读取formhash/loginhash/radio/验证码标记，
+           输出每次调用的平均耗时和峰值内存
+    store: 在不同题库规模下对比SQLite答案库和旧的wrong.json/wrong.txt的查询、写入耗时
+    fuzzy: 在不同题库规模下测试近似题目查询的耗时和召回（题目加标点、全角、空格或改一个字）
+    rank:  本地排序器的建立和单题打分耗时；指定--db时留出部分有正确答案的题目测试准确率
+    question: 用bench_pages中保存的答题页面对比parse_question和旧的逐个正则实现，
+           输出各页面耗时，并标出结果不一致、耗时超过旧实现的--max-ratio倍或超过--baseline中记录耗时的
+           1+--tolerance倍的页面；CI中的回归检查见test_parse_question.py
+    encoding: 对保存的页面（UTF-8和GBK两种编码）对比读取response.text时编码探测和使用已知编码的耗时
+"""
+
+def full_lookup(html, backend):
+    """完整解析后逐个查找"""
+    document = parse_html(html, backend)
+    formhash_input = document.find('input', {'name': 'formhash'})
+    formhash = formhash_input.get('value') if formhash_input else ''
+    login_form = document.find('form', {'name': 'login'})
+    action = login_form.get('action', '') if login_form else ''
+    radio_input = document.find('input', {'id': 'a1', 'type': 'radio'})
+    radio = radio_input.get('value') if radio_input else None
+    verify_img = document.find('img', class_='verifyimg') is not None
+    return formhash, action, radio, verify_img
+
+def fast_lookup(html):
+    """快速提取：一次扫描后查字典"""
+    fields = extract_fields(html)
+    formhash = fields.inputs.get('formhash') or ''
+    action = fields.forms.get('login', '')
+    attrs = fields.inputs_by_id.get('a1')
+    radio = attrs.get('value') if attrs and attrs.get('type', '').lower() == 'radio' else None
+    verify_img = fields.has_marker('img', 'verifyimg')
+    return formhash, action, radio, verify_img
+
+def measure(func, html, repeat):
+    """返回(平均耗时毫秒, 单次调用峰值内存KB)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+def collect_pages(paths):
+    """收集待测页面，目录则取其中所有html文件"""
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            pages.extend(sorted(glob.glob(os.path.join(path, '*.html'))))
+        else:
+            pages.append(path)
+    return pages
+
+def bench_parse(pages, repeat, backends):
+    methods = [('fast', fast_lookup)] + [(name, partial(full_lookup, backend=name)) for name in backends]
+    print(f"{'页面':<32} {'大小KB':>8} " + " ".join(f"{name + ' ms':>16} {name + ' KB':>16}" for name, _ in methods))
+    print("-" * (42 + 34 * len(methods)))
+    for path in pages:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        # 以html.parser的结果为准检查其他方式是否一致
+        expected = full_lookup(html, 'html.parser')
+        row = []
+        for name, func in methods:
+            result = func(html)
+            if result != expected:
+                print(f"[警告] {path} {name} 结果与html.parser不一致: {result} != {expected}")
+            elapsed, peak = measure(func, html, repeat)
+            row.append(f"{elapsed:>16.3f} {peak:>16.1f}")
+        name = os.path.basename(path)[:32]
+        print(f"{name:<32} {len(html) / 1024:>8.1f} " + " ".join(row))
+
+def synthetic_questions(size):
+    """生成size道题目，每道4个选项、1个错误答案"""
+    for i in range(size):
+        options = {f"a{j}": f"选项{i}-{j}" for j in range(1, 5)}
+        yield f"第{i}题：这是一道用于测试的题目？", options, f"a{i % 4 + 1}"
+
+INSERT_SQL = "INSERT INTO answers (key, qkey, question, options, correct, wrong, updated) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+def build_store(path, size):
+    """直接批量写入SQLite，避免逐条record影响建库时间"""
+    store = AnswerStore(path)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    batch = []
+    for question_text, options, label in synthetic_questions(size):
+        batch.append((question_key(question_text, options), question_only_key(question_text), question_text,
+                      json.dumps(options, ensure_ascii=False), None,
+                      json.dumps([options[label]], ensure_ascii=False), now))
+        if len(batch) >= 10000:
+            store.conn.executemany(INSERT_SQL, batch)
+            batch = []
+    if batch:
+        store.conn.executemany(INSERT_SQL, batch)
+    store.conn.commit()
+    return store
+
+def legacy_json_save(path, question_text, answer_id, options_dict):
+    """旧的save_wrong_question：整文件读入、线性查找、整文件写回"""
+    with open(path, 'r', encoding='utf-8') as f:
+        wrong_data = json.load(f)
+    entry = {"question": question_text, "wrong_answer": answer_id, "options": options_dict}
+    for i, item in enumerate(wrong_data):
+        if item.get("question") == question_text:
+            wrong_data[i] = entry
+            break
+    else:
+        wrong_data.append(entry)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(wrong_data, f, ensure_ascii=False, indent=2)
+
+def legacy_txt_search(path, question_text):
+    """旧的search_wrong_answers：整文件读入后正则查找"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if question_text not in content:
+        return None
+    match = re.search(re.escape(question_text) + r'\n((?:a[1-4]: [^\n]+(?:, )?)+)', content)
+    return re.findall(r'a[1-4]', match.group(1)) if match else None
+
+def timed(func, samples):
+    """对每个样本调用func，返回平均耗时（微秒）"""
+    start = time.perf_counter()
+    for sample in samples:
+        func(*sample)
+    return (time.perf_counter() - start) / len(samples) * 1e6
+
+def bench_store(sizes, ops, legacy_max):
+    print(f"{'题库规模':>10} {'建库s':>8} {'查询us':>10} {'未命中us':>10} {'写入us':>10} {'json写入us':>14} {'txt查询us':>12}")
+    print("-" * 82)
+    for size in sizes:
+        workdir = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            store = build_store(os.path.join(workdir, 'answers.db'), size)
+            build_seconds = time.perf_counter() - start
+
+            picks = [random.randrange(size) for _ in range(ops)]
+            existing = [(f"第{i}题：这是一道用于测试的题目？", {f"a{j}": f"选项{i}-{j}" for j in range(1, 5)}) for i in picks]
+            missing = [(f"不存在的题目{i}", {"a1": "x"}) for i in range(ops)]
+            hit_us = timed(store.get, existing)
+            miss_us = timed(store.get, missing)
+            write_us = timed(lambda q, o: store.record(q, o, 'a2', False), existing)
+            store.close()
+
+            json_us = txt_us = None
+            if size <= legacy_max:
+                json_path = os.path.join(workdir, 'wrong.json')
+                txt_path = os.path.join(workdir, 'wrong.txt')
+                entries = []
+                with open(txt_path, 'w', encoding='utf-8') as f:
+                    for question_text, options, label in synthetic_questions(size):
+                        entries.append({"question": question_text, "wrong_answer": label, "options": options})
+                        f.write(f"{question_text}\n{label}: {options[label]}\n")
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False, indent=2)
+                del entries
+                # 旧格式每次操作都是O(N)，只取少量样本
+                legacy_samples = existing[:3]
+                json_us = timed(lambda q, o: legacy_json_save(json_path, q, 'a2', o), legacy_samples)
+                txt_us = timed(lambda q, o: legacy_txt_search(txt_path, q), legacy_samples)
+
+            json_text = f"{json_us:>14.0f}" if json_us is not None else f"{'-':>14}"
+            txt_text = f"{txt_us:>12.0f}" if txt_us is not None else f"{'-':>12}"
+            print(f"{size:>10} {build_seconds:>8.2f} {hit_us:>10.1f} {miss_us:>10.1f} {write_us:>10.1f} {json_text} {txt_text}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def perturb(text, pool):
+    """模拟论坛题目的细微差异：插入标点、加空格/&nbsp;、全角字母数字、替换一个字"""
+    position = random.randrange(len(text))
+    choice = random.randrange(4)
+    if choice == 0:
+        return text[:position] + random.choice('，。？！、') + text[position:]
+    if choice == 1:
+        return text + random.choice([' ', '&nbsp;', '\u3000'])
+    if choice == 2:
+        return text[:position] + 'ＡＢ１２' + text[position:]
+    return text[:position] + random.choice(pool) + text[position + 1:]
+
+def bench_fuzzy(sizes, ops, threshold):
+    # 常用汉字区间内随机组合，避免合成题目之间过于相似
+    pool = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+    print(f"{'题库规模':>10} {'建索引s':>8} {'平均ms':>8} {'p99 ms':>8} {'召回':>8}")
+    print("-" * 48)
+    for size in sizes:
+        questions = [''.join(random.choice(pool) for _ in range(random.randint(10, 30))) for _ in range(size)]
+        start = time.perf_counter()
+        index = QuestionIndex()
+        for doc_id, text in enumerate(questions):
+            index.add(doc_id, text)
+        build_seconds = time.perf_counter() - start
+
+        timings = []
+        found = 0
+        for doc_id in random.sample(range(size), min(ops, size)):
+            query = perturb(questions[doc_id], pool)
+            start = time.perf_counter()
+            results = index.search(query, threshold)
+            timings.append((time.perf_counter() - start) * 1000)
+            if results and results[0][0] == doc_id:
+                found += 1
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{size:>10} {build_seconds:>8.2f} {sum(timings) / len(timings):>8.3f} {p99:>8.3f} {found / len(timings):>8.1%}")
+
+def bench_rank(sizes, ops, db_path, holdout):
+    pool = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+    print(f"{'题库规模':>10} {'建立s':>8} {'平均ms':>8} {'p99 ms':>8}")
+    print("-" * 38)
+    for size in sizes:
+        ranker = LocalRanker()
+        start = time.perf_counter()
+        questions = []
+        for doc_id in range(size):
+            text = ''.join(random.choice(pool) for _ in range(random.randint(10, 30)))
+            options = {f"a{j}": ''.join(random.choice(pool) for _ in range(4)) for j in range(1, 5)}
+            questions.append((text, options))
+            ranker.add(doc_id, text, options['a1'], [options['a2']])
+        build_seconds = time.perf_counter() - start
+        timings = []
+        for doc_id in random.sample(range(size), min(ops, size)):
+            text, options = questions[doc_id]
+            start = time.perf_counter()
+            ranker.rank(perturb(text, pool), options)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{size:>10} {build_seconds:>8.2f} {sum(timings) / len(timings):>8.3f} {p99:>8.3f}")
+
+    if not db_path:
+        return
+    # 真实题库：随机留出一部分有正确答案的题目，用其余题目建立排序器后测试
+    store = AnswerStore(db_path, fuzzy_threshold=0)
+    rows = store.conn.execute("SELECT rowid, question, options, correct, wrong FROM answers").fetchall()
+    store.close()
+    random.shuffle(rows)
+    test_count = int(sum(1 for row in rows if row[3]) * holdout)
+    tests, ranker = [], LocalRanker()
+    for rowid, question, options, correct, wrong in rows:
+        if correct and len(tests) < test_count:
+            tests.append((question, json.loads(options), correct))
+        else:
+            ranker.add(rowid, question, correct, json.loads(wrong))
+    # 按置信度分档统计：(作答数, 正确数)
+    buckets = {0.0: [0, 0], 0.5: [0, 0], 0.8: [0, 0]}
+    for question, options, correct in tests:
+        label, confidence = ranker.best(question, options)
+        if not label:
+            continue
+        for low, counts in buckets.items():
+            if confidence >= low:
+                counts[0] += 1
+                counts[1] += correct == normalize_text(options[label])
+    print(f"\n留出{len(tests)}题（用{len(ranker)}题建立排序器）")
+    for low, (answered, right) in buckets.items():
+        rate = right / answered if answered else 0
+        print(f"置信度>={low:.1f}: 作答{answered}题，正确{right}题（{rate:.1%}）")
+
+def legacy_parse_question(html):
+    """旧的parse_question（每次调用编译正则，选项不足4个时逐个DOTALL扫描整页），作为对照"""
+    question_match = re.search(r'【题目】</b>&nbsp;([^<]+)', html)
+    question_text = question_match.group(1) if question_match else ""
+    options_dict = {}
+    matches = re.findall(r'id="(a\d)"[^>]*>&nbsp;&nbsp;([^<]+)', html, re.DOTALL)
+    for option_id, option_text in matches:
+        options_dict[option_id] = option_text.strip()
+    if len(options_dict) < 4:
+        for i in range(1, 5):
+            aid = f"a{i}"
+            if aid not in options_dict:
+                match = re.search(rf'id="{aid}"[^>]*>.*?([^<]+)</div>', html, re.DOTALL)
+                if match:
+                    options_dict[aid] = match.group(1).replace('&nbsp;', ' ').strip()
+    return question_text, options_dict
+
+def legacy_question_page(html):
+    """旧流程处理一道题：answer_question和build_prompt各解析一次，radio的value另外用快速提取读取"""
+    legacy_parse_question(html)
+    question_text, options_dict = legacy_parse_question(html)
+    fields = extract_fields(html)
+    radios = {}
+    for option_id in options_dict:
+        attrs = fields.inputs_by_id.get(option_id)
+        if attrs is not None and attrs.get('type', '').lower() == 'radio':
+            radios[option_id] = attrs.get('value')
+    return question_text, options_dict, radios
+
+def new_question_page(html):
+    """新流程：两次调用parse_question，第二次命中缓存"""
+    parse_question.cache_clear()
+    parse_question(html)
+    return parse_question(html)
+
+def bench_question(pages, repeat, max_ratio, baseline_path, tolerance, save_baseline):
+    baseline = {}
+    if baseline_path and os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    failures = []
+    results = {}
+    print(f"{'页面':<32} {'大小KB':>8} {'旧实现 ms':>10} {'新实现 ms':>10} {'比例':>8} {'基线 ms':>10}")
+    print("-" * 84)
+    for path in pages:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        name = os.path.basename(path)
+        expected = legacy_question_page(html)
+        result = new_question_page(html)
+        if result != expected:
+            failures.append(f"{name} 解析结果不一致: {result} != {expected}")
+        legacy_ms, _ = measure(legacy_question_page, html, repeat)
+        new_ms, _ = measure(new_question_page, html, repeat)
+        ratio = new_ms / legacy_ms if legacy_ms else 0
+        results[name] = round(new_ms, 4)
+        base = baseline.get(name)
+        base_text = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+        print(f"{name[:32]:<32} {len(html) / 1024:>8.1f} {legacy_ms:>10.3f} {new_ms:>10.3f} {ratio:>8.2f} {base_text}")
+        if ratio > max_ratio:
+            failures.append(f"{name} 新实现耗时是旧实现的 {ratio:.2f} 倍，超过 {max_ratio}")
+        if base is not None and new_ms > base * (1 + tolerance):
+            failures.append(f"{name} 耗时 {new_ms:.3f}ms 超过基线 {base:.3f}ms 的 {1 + tolerance:.0%}")
+
+    if save_baseline and baseline_path:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {baseline_path}")
+    for failure in failures:
+        print(f"[警告] {failure}")
+    return not failures
+
+def bench_encoding(pages, repeat, charsets):
+    def make_response(body, encoding):
+        response = requests.Response()
+        response._content = body
+        response.encoding = encoding
+        return response
+
+    print(f"{'页面':<32} {'编码':>6} {'大小KB':>8} {'探测 ms':>10} {'已知编码 ms':>12} {'探测结果':>12}")
+    print("-" * 86)
+    for path in pages:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        name = os.path.basename(path)[:32]
+        for charset in charsets:
+            body = html.encode(charset, errors='replace')
+            detected = make_response(body, None)
+            # 与requests一样，response.encoding为None时每次读取text都重新探测
+            detect_ms, _ = measure(lambda _: detected.text, None, repeat)
+            known = make_response(body, charset)
+            known_ms, _ = measure(lambda _: known.text, None, repeat)
+            guess = detected.apparent_encoding or '-'
+            if detected.text != known.text:
+                print(f"[警告] {name} {charset} 探测到的编码 {guess} 解码结果与实际不一致")
+            print(f"{name:<32} {charset:>6} {len(body) / 1024:>8.1f} {detect_ms:>10.3f} {known_ms:>12.3f} {guess:>12}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parse_parser = subparsers.add_parser('parse', help='Page parsing: fast extractor vs full-parse backends')
+    parse_parser.add_argument('pages', nargs='*', help='html files or directories (default: failure_*.html)')
+    parse_parser.add_argument('--repeat', type=int, default=50, help='calls per page')
+    parse_parser.add_argument('--backend', action='append', choices=AVAILABLE_BACKENDS,
+                              help='full-parse backend to compare (default: all installed)')
+
+    store_parser = subparsers.add_parser('store', help='Answer store vs legacy wrong.json/wrong.txt')
+    store_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='question bank sizes')
+    store_parser.add_argument('--ops', type=int, default=1000, help='lookups/writes per size')
+    store_parser.add_argument('--legacy-max', type=int, default=100000,
+                              help='largest size to run the O(N) legacy formats at')
+    fuzzy_parser = subparsers.add_parser('fuzzy', help='Near-duplicate question lookup latency and recall')
+    fuzzy_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='question bank sizes')
+    fuzzy_parser.add_argument('--ops', type=int, default=1000, help='queries per size')
+    fuzzy_parser.add_argument('--threshold', type=float, default=0.8, help='similarity threshold')
+    rank_parser = subparsers.add_parser('rank', help='Offline ranker latency, and holdout accuracy on a real answer db')
+    rank_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='synthetic question bank sizes')
+    rank_parser.add_argument('--ops', type=int, default=1000, help='queries per size')
+    rank_parser.add_argument('--db', help='answers.db to measure holdout accuracy on')
+    rank_parser.add_argument('--holdout', type=float, default=0.2, help='fraction of answered questions held out')
+    question_parser = subparsers.add_parser('question', help='parse_question regression check against the legacy regexes')
+    question_parser.add_argument('pages', nargs='*', help='html files or directories (default: bench_pages)')
+    question_parser.add_argument('--repeat', type=int, default=500, help='calls per page')
+    question_parser.add_argument('--max-ratio', type=float, default=1.0,
+                                 help='flag pages where the new parser takes more than this fraction of the legacy time')
+    question_parser.add_argument('--baseline', help='JSON file of per-page ms to compare against')
+    question_parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown over the baseline')
+    question_parser.add_argument('--save-baseline', action='store_true', help='write the measured times to --baseline')
+    encoding_parser = subparsers.add_parser('encoding', help='response.text with charset detection vs a known encoding')
+    encoding_parser.add_argument('pages', nargs='*', help='html files or directories (default: bench_pages and failure_*.html)')
+    encoding_parser.add_argument('--repeat', type=int, default=20, help='reads per page')
+    encoding_parser.add_argument('--charset', action='append', help='encodings to test (default: utf-8 and gbk)')
+    args = parser.parse_args()
+
+    if args.command == 'parse':
+        pages = collect_pages(args.pages) if args.pages else sorted(glob.glob('failure_*.html'))
+        if not pages:
+            print("没有找到待测页面，请传入保存的html文件或目录")
+            return
+        bench_parse(pages, args.repeat, args.backend or AVAILABLE_BACKENDS)
+    elif args.command == 'store':
+        bench_store(args.sizes, args.ops, args.legacy_max)
+    elif args.command == 'fuzzy':
+        bench_fuzzy(args.sizes, args.ops, args.threshold)
+    elif args.command == 'rank':
+        bench_rank(args.sizes, args.ops, args.db, args.holdout)
+    elif args.command == 'question':
+        pages = collect_pages(args.pages or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_pages')])
+        bench_question(pages, args.repeat, args.max_ratio, args.baseline, args.tolerance, args.save_baseline)
+    elif args.command == 'encoding':
+        pages = collect_pages(args.pages or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_pages')]
+                              + sorted(glob.glob('failure_*.html')))
+        bench_encoding(pages, args.repeat, args.charset or ['utf-8', 'gbk'])
+
+if __name__ == '__main__':
+    main()
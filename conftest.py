@@ -0,0 +1,2 @@
+# test_api.py是手动调用DashScope的脚本（导入时读取config.json），不是测试
+collect_ignore = ["test_api.py"]
@@ -0,0 +1,132 @@
+"""
+    本地答案排序器：
+    不联网，只根据答案库中积累的题目给当前题目的选项打分，毫秒级返回，
+    可以在大模型调用失败/超时时兜底，也可以在置信度足够高时直接作答
+
+    三个信号（都基于answer_index的字符二元组）：
+    1. 近似题检索：取相似度最高的若干道历史题，选项与其正确答案相同/相近加分，是已知错误选项减分
+    2. 选项先验：同一选项文本在整个题库中作为正确答案和错误答案的次数（如“以上都对”）
+    3. 共现：选项文本作为正确答案时，题目中出现过的二元组（同一答案常对应同一类题目）
+
+    打分后在候选选项间做softmax，最高的概率即为置信度
+"""
+import json
+import math
+import sqlite3
+import time
+from collections import defaultdict
+from answer_index import QuestionIndex, shingles
+from answer_store import iter_rows, normalize_text
+
+# 各信号的权重
+RETRIEVAL_WEIGHT = 3.0
+PRIOR_WEIGHT = 1.0
+COOCCURRENCE_WEIGHT = 1.0
+
+
+class LocalRanker:
+    """基于历史题库的选项排序"""
+
+    def __init__(self, neighbor_threshold=0.3, neighbors=20):
+        self.neighbor_threshold = neighbor_threshold
+        self.neighbors = neighbors
+        self.index = QuestionIndex()
+        self.answers = {}                               # 文档id -> (正确选项文本, {错误选项文本})
+        self.option_counts = defaultdict(lambda: [0, 0])  # 选项文本 -> [作为正确答案次数, 作为错误答案次数]
+        self.cooccurrence = defaultdict(lambda: defaultdict(int))  # 正确选项文本 -> {题目二元组: 次数}
+
+    def __len__(self):
+        return len(self.answers)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """从答案库读取全部记录建立排序器"""
+        return cls.from_connection(store.conn, **kwargs)
+
+    @classmethod
+    def from_db(cls, path, **kwargs):
+        """用单独的连接读取答案库建立排序器，可以在后台线程中调用"""
+        conn = sqlite3.connect(path)
+        try:
+            return cls.from_connection(conn, **kwargs)
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_connection(cls, conn, **kwargs):
+        start = time.time()
+        ranker = cls(**kwargs)
+        for rowid, question, correct, wrong in iter_rows(conn, ('question', 'correct', 'wrong')):
+            ranker.add(rowid, question, correct, json.loads(wrong))
+        print(f"[调试] 本地排序器已建立: {len(ranker)} 道题，耗时 {time.time() - start:.2f} 秒")
+        return ranker
+
+    def add(self, doc_id, question_text, correct, wrong):
+        """加入一道历史题，correct/wrong为规范化后的选项文本"""
+        if not correct and not wrong:
+            return
+        self.index.add(doc_id, question_text)
+        self.answers[doc_id] = (correct, set(wrong))
+        if correct:
+            self.option_counts[correct][0] += 1
+            token_counts = self.cooccurrence[correct]
+            for token in shingles(question_text):
+                token_counts[token] += 1
+        for text in wrong:
+            self.option_counts[text][1] += 1
+
+    def _retrieval_score(self, neighbors, option_text, option_tokens):
+        score = 0.0
+        for doc_id, similarity in neighbors:
+            correct, wrong = self.answers[doc_id]
+            if option_text == correct:
+                score += similarity
+            elif option_text in wrong:
+                score -= similarity
+            elif correct and option_tokens:
+                # 选项文本不完全相同时按二元组重合度部分加分
+                correct_tokens = shingles(correct)
+                overlap = len(option_tokens & correct_tokens) / len(option_tokens | correct_tokens)
+                if overlap >= 0.5:
+                    score += similarity * overlap
+        return score
+
+    def _prior_score(self, option_text):
+        correct, wrong = self.option_counts.get(option_text, (0, 0))
+        return math.log((correct + 1) / (wrong + 1))
+
+    def _cooccurrence_score(self, question_tokens, option_text):
+        """选项作为正确答案的题目中，包含当前题目各二元组的比例的平均值"""
+        token_counts = self.cooccurrence.get(option_text)
+        if not token_counts or not question_tokens:
+            return 0.0
+        seen = self.option_counts[option_text][0]
+        return sum(token_counts.get(token, 0) for token in question_tokens) / (seen * len(question_tokens))
+
+    def rank(self, question_text, options_dict, candidates=None):
+        """给候选选项打分，返回[(选项ID, 概率)]按概率从高到低排列，题库中没有任何相关信息时返回[]"""
+        labels = [label for label in sorted(options_dict) if candidates is None or label in candidates]
+        if not labels or not self.answers:
+            return []
+        question_tokens = shingles(question_text)
+        neighbors = self.index.search(question_text, self.neighbor_threshold, self.neighbors)
+
+        scores = {}
+        for label in labels:
+            option_text = normalize_text(options_dict[label])
+            option_tokens = shingles(option_text)
+            scores[label] = (RETRIEVAL_WEIGHT * self._retrieval_score(neighbors, option_text, option_tokens)
+                             + PRIOR_WEIGHT * self._prior_score(option_text)
+                             + COOCCURRENCE_WEIGHT * self._cooccurrence_score(question_tokens, option_text))
+        if all(score == 0 for score in scores.values()):
+            return []
+
+        top = max(scores.values())
+        weights = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(weights.values())
+        return sorted(((label, weight / total) for label, weight in weights.items()), key=lambda item: -item[1])
+
+    def best(self, question_text, options_dict, candidates=None):
+        """返回(最可能的选项ID, 置信度)，没有依据时返回(None, 0)"""
+        ranked = self.rank(question_text, options_dict, candidates)
+        return ranked[0] if ranked else (None, 0.0)
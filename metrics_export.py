@@ -0,0 +1,121 @@
+"""
+    运行指标导出：
+    把一次运行的指标写成Prometheus文本格式（0.0.4）的文件，供node_exporter的textfile collector等采集：
+
+        families = [
+            counter("mission_login_attempts", "Login attempts in the last run", [({}, 2)]),
+            histogram("mission_llm_call_duration_seconds", "LLM call latency", {(): [3.2, 8.1]}, LLM_BUCKETS),
+        ]
+        write_textfile("/var/lib/node_exporter/textfile/mission.prom", families)
+
+    文件先写到同目录的临时文件再os.replace替换，采集时不会读到写了一半的文件
+    node_exporter按Prometheus文本格式解析，OpenMetrics格式的计数器（TYPE为xxx、样本为xxx_total）
+    会被当成untyped，所以默认输出Prometheus格式；openmetrics=True时输出OpenMetrics格式
+    （带UNIT行和# EOF结尾），供直接按OpenMetrics抓取的采集端使用
+"""
+import math
+import os
+import tempfile
+
+# 单个HTTP请求耗时的分桶（秒）
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 单次大模型调用耗时的分桶（秒）
+LLM_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 60)
+
+
+class MetricFamily:
+    """一个指标族：samples为[(后缀, 标签字典, 值)]"""
+
+    def __init__(self, name, metric_type, help_text, unit=None):
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        self.unit = unit
+        self.samples = []
+
+
+def counter(name, help_text, values):
+    """计数器，values为[(标签字典, 值)]，样本名为name_total"""
+    family = MetricFamily(name, 'counter', help_text)
+    for labels, value in values:
+        family.samples.append(('_total', labels, value))
+    return family
+
+
+def gauge(name, help_text, values, unit=None):
+    """仪表，values为[(标签字典, 值)]"""
+    family = MetricFamily(name, 'gauge', help_text, unit)
+    for labels, value in values:
+        family.samples.append(('', labels, value))
+    return family
+
+
+def histogram(name, help_text, observations, buckets, unit='seconds'):
+    """直方图，observations为 标签元组((名, 值), ...) -> [观测值]"""
+    family = MetricFamily(name, 'histogram', help_text, unit)
+    for label_items, values in sorted(observations.items()):
+        labels = dict(label_items)
+        for bound in buckets:
+            family.samples.append(('_bucket', {**labels, 'le': _format_value(float(bound))},
+                                   sum(1 for value in values if value <= bound)))
+        family.samples.append(('_bucket', {**labels, 'le': '+Inf'}, len(values)))
+        family.samples.append(('_count', labels, len(values)))
+        family.samples.append(('_sum', labels, float(sum(values))))
+    return family
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families, openmetrics=False):
+    """生成文本，默认为Prometheus 0.0.4文本格式，openmetrics=True时输出OpenMetrics格式"""
+    lines = []
+    for family in families:
+        if not family.samples:
+            continue
+        # Prometheus格式中计数器的TYPE要写完整的样本名
+        name = family.name + '_total' if family.type == 'counter' and not openmetrics else family.name
+        lines.append(f"# HELP {name} {_escape(family.help)}")
+        lines.append(f"# TYPE {name} {family.type}")
+        if family.unit and openmetrics:
+            lines.append(f"# UNIT {name} {family.unit}")
+        for suffix, labels, value in family.samples:
+            label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            sample = family.name + suffix + (f"{{{label_text}}}" if label_text else "")
+            lines.append(f"{sample} {_format_value(value)}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, families, openmetrics=False):
+    """原子地写出指标文件：写临时文件、fsync后替换目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(render(families, openmetrics))
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp创建的文件只有属主可读，采集进程通常是其他用户
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,249 @@
+"""
+    页面解析：
+    1. 快速路径：用一次正则扫描取出页面中的input、form和img标签属性（跳过script和注释）
+    2. 完整解析：快速路径找不到需要的字段时，用可插拔的解析后端构建完整文档
+       后端按速度优先自动选择 selectolax > lxml > html.parser，
+       可通过环境变量PAGE_PARSER或脚本的--parser参数强制指定
+    3. 答题页面：parse_question一次扫描取出题目、选项文本和radio的value，同一页面的结果会缓存
+"""
+import os
+import re
+from functools import lru_cache
+from html import unescape
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# 已安装的后端，按速度从快到慢排列
+AVAILABLE_BACKENDS = [name for name, installed in (
+    ('selectolax', SelectolaxParser is not None),
+    ('lxml', lxml is not None),
+    ('html.parser', True),
+) if installed]
+BACKEND = None
+
+# Discuz的inajax接口返回的是带xml声明的文档，lxml不接受带编码声明的字符串
+_XML_DECL_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+# script/注释整体跳过，只关心input、form、img三种标签
+_TAG_RE = re.compile(r'<script\b.*?</script\s*>|<!--.*?-->|<(input|form|img)\b([^>]*)>', re.IGNORECASE | re.DOTALL)
+_ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+
+# 答题页面：题目，以及带id="a1"~"a4"的选项radio和紧跟在后面的"&nbsp;&nbsp;选项文本"
+# 两个正则都以固定文本开头，re可以快速跳过无关内容
+_QUESTION_RE = re.compile(r'【题目】</b>&nbsp;([^<]+)')
+_OPTION_RE = re.compile(r'id="(a\d)"[^>]*>(?:&nbsp;&nbsp;([^<]+))?')
+# 选项文本的另一种写法：radio之后第一个以</div>结尾的文本
+_OPTION_DIV_RE = re.compile(r'([^<]+)</div>')
+_TAG_NAME_RE = re.compile(r'<(\w+)')
+
+
+def select_backend(name=None):
+    """选择完整解析使用的后端，未指定或不可用时自动选择已安装的最快后端"""
+    global BACKEND
+    if name and name not in AVAILABLE_BACKENDS:
+        print(f"[警告] 解析后端 {name} 不可用，可用后端: {', '.join(AVAILABLE_BACKENDS)}")
+        name = None
+    BACKEND = name or AVAILABLE_BACKENDS[0]
+    print(f"[调试] HTML解析后端: {BACKEND}")
+    return BACKEND
+
+
+def _match(attrs, conditions):
+    """判断标签属性是否满足条件，条件值可以是字符串或正则，class按单个类名匹配"""
+    for name, expected in conditions.items():
+        value = attrs.get(name)
+        if value is None:
+            return False
+        if name == 'class':
+            if expected not in value.split():
+                return False
+        elif hasattr(expected, 'search'):
+            if not expected.search(value):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class Document:
+    """完整解析后的文档，find/find_all的用法与BeautifulSoup一致，返回标签属性字典"""
+
+    def __init__(self, html, backend=None):
+        self.backend = backend or BACKEND
+        if self.backend == 'selectolax':
+            self._tree = SelectolaxParser(html)
+        elif self.backend == 'lxml':
+            html = _XML_DECL_RE.sub('', html)
+            self._tree = lxml.html.document_fromstring(html) if html.strip() else None
+        else:
+            self._tree = BeautifulSoup(html, 'html.parser')
+
+    def _iter_tags(self, tag):
+        if self.backend == 'selectolax':
+            for node in self._tree.css(tag):
+                yield {k: (v if v is not None else '') for k, v in node.attributes.items()}
+        elif self.backend == 'lxml':
+            if self._tree is None:
+                return
+            for element in self._tree.iter(tag):
+                yield dict(element.attrib)
+        else:
+            for element in self._tree.find_all(tag):
+                attrs = dict(element.attrs)
+                if isinstance(attrs.get('class'), list):
+                    attrs['class'] = ' '.join(attrs['class'])
+                yield attrs
+
+    def find_all(self, tag, attrs=None, **kwargs):
+        conditions = dict(attrs or {})
+        for name, value in kwargs.items():
+            conditions['class' if name == 'class_' else name] = value
+        return [item for item in self._iter_tags(tag) if _match(item, conditions)]
+
+    def find(self, tag, attrs=None, **kwargs):
+        result = self.find_all(tag, attrs, **kwargs)
+        return result[0] if result else None
+
+
+def parse_html(html, backend=None):
+    """用当前（或指定的）后端完整解析页面"""
+    return Document(html, backend)
+
+
+def _parse_attrs(attr_text):
+    """解析标签属性，属性名统一小写"""
+    attrs = {}
+    for match in _ATTR_RE.finditer(attr_text):
+        name = match.group(1).lower()
+        if name in attrs:
+            continue
+        value = match.group(2)
+        if value is None:
+            value = match.group(3) if match.group(3) is not None else match.group(4)
+        attrs[name] = unescape(value)
+    return attrs
+
+
+class PageFields:
+    """单次扫描得到的页面字段，字段缺失时回退到完整解析"""
+
+    def __init__(self, html):
+        self.html = html
+        self.inputs = {}        # name -> value
+        self.inputs_by_id = {}  # id -> 属性字典
+        self.forms = {}         # name -> action
+        self.markers = set()    # (标签, class)
+        self.fallbacks = 0
+        self._document = None
+        self._scan()
+
+    def _scan(self):
+        for match in _TAG_RE.finditer(self.html):
+            tag = match.group(1)
+            if not tag:
+                continue
+            tag = tag.lower()
+            attrs = _parse_attrs(match.group(2))
+            if tag == 'input':
+                name = attrs.get('name')
+                if name and name not in self.inputs:
+                    self.inputs[name] = attrs.get('value')
+                input_id = attrs.get('id')
+                if input_id and input_id not in self.inputs_by_id:
+                    self.inputs_by_id[input_id] = attrs
+            elif tag == 'form':
+                name = attrs.get('name')
+                if name and name not in self.forms:
+                    self.forms[name] = attrs.get('action', '')
+            for class_name in attrs.get('class', '').split():
+                self.markers.add((tag, class_name))
+
+    @property
+    def document(self):
+        """完整解析的文档，只在快速路径未命中时构建"""
+        if self._document is None:
+            self.fallbacks += 1
+            print("[调试] 快速提取未命中，回退到完整解析")
+            self._document = parse_html(self.html)
+        return self._document
+
+    def input_value(self, name):
+        """按name获取input的value，找不到返回None"""
+        if name in self.inputs:
+            return self.inputs[name]
+        tag = self.document.find('input', {'name': name})
+        return tag.get('value') if tag else None
+
+    def radio_value(self, input_id):
+        """按id获取radio的value，找不到返回None"""
+        attrs = self.inputs_by_id.get(input_id)
+        if attrs is not None and attrs.get('type', '').lower() == 'radio':
+            return attrs.get('value')
+        tag = self.document.find('input', {'id': input_id, 'type': 'radio'})
+        return tag.get('value') if tag else None
+
+    def form_action(self, name):
+        """按name获取form的action，找不到返回None"""
+        if name in self.forms:
+            return self.forms[name]
+        tag = self.document.find('form', {'name': name})
+        return tag.get('action', '') if tag else None
+
+    def has_marker(self, tag, class_name):
+        """页面中是否存在带指定class的标签（仅限input/form/img），扫描结果即为结论"""
+        return (tag, class_name) in self.markers
+
+
+@lru_cache(maxsize=8)
+def parse_question(html):
+    """
+    解析答题页面，返回(题目, {选项ID: 选项文本}, {选项ID: radio的value})
+    同一页面重复调用直接返回缓存的结果，调用方不要修改返回的字典
+    """
+    question_match = _QUESTION_RE.search(html)
+    question_text = question_match.group(1) if question_match else ""
+    options_dict = {}
+    radio_values = {}
+    # 没有紧跟"&nbsp;&nbsp;文本"的选项，记下第一次出现的位置，扫描结束后再往后找</div>前的文本
+    pending = {}
+    for match in _OPTION_RE.finditer(html):
+        option_id = match.group(1)
+        if option_id not in radio_values:
+            # 往前找到标签开头，取出整个标签的属性（value可能写在id前面）
+            tag_start = html.rfind('<', 0, match.start())
+            tag_match = _TAG_NAME_RE.match(html, tag_start) if tag_start >= 0 else None
+            if tag_match and tag_match.group(1).lower() == 'input':
+                attrs = _parse_attrs(html[tag_match.end():html.index('>', match.start())])
+                if attrs.get('type', '').lower() == 'radio':
+                    radio_values[option_id] = attrs.get('value')
+        if match.group(2) is not None:
+            options_dict[option_id] = match.group(2).strip()
+        elif option_id not in pending:
+            pending[option_id] = match.end()
+
+    if len(options_dict) < 4:
+        for i in range(1, 5):
+            option_id = f"a{i}"
+            if option_id not in options_dict and option_id in pending:
+                div_match = _OPTION_DIV_RE.search(html, pending[option_id])
+                if div_match:
+                    options_dict[option_id] = div_match.group(1).replace('&nbsp;', ' ').strip()
+
+    return question_text, options_dict, radio_values
+
+
+def extract_fields(html):
+    """对页面做一次快速扫描，返回PageFields"""
+    return PageFields(html)
+
+
+select_backend(os.environ.get('PAGE_PARSER'))
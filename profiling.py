@@ -0,0 +1,82 @@
+"""
+    单次运行的性能剖析：
+    用cProfile统计CPU耗时、tracemalloc统计内存分配，运行结束（包括失败）后在当前目录
+    （与failure_log_*.json相同位置）写出：
+    - profile_时间戳.pstats：原始数据，可用 python -m pstats / snakeviz 查看
+    - profile_时间戳.txt：按累计耗时和自身耗时排序的前N个函数、按代码行统计的前N处内存分配、峰值RSS
+
+    cProfile只统计调用它的线程，后台线程（大模型调用）只计入等待时间
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+from answer_store import peak_rss_mb
+
+# 分配统计中忽略的模块
+IGNORED_FILES = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>',
+                 tracemalloc.__file__)
+
+
+def allocation_table(snapshot, top):
+    """按代码行统计仍未释放的内存分配，返回文本表格"""
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, pattern) for pattern in IGNORED_FILES])
+    stats = snapshot.statistics('lineno')
+    lines = [f"{'大小(KB)':>10} {'次数':>8}  位置"]
+    for stat in stats[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:>10.1f} {stat.count:>8}  {frame.filename}:{frame.lineno}")
+    total = sum(stat.size for stat in stats)
+    lines.append(f"合计 {total / 1024:.1f} KB，共 {len(stats)} 处")
+    return "\n".join(lines)
+
+
+def cpu_table(profiler, sort, top):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats(sort).print_stats(top)
+    return stream.getvalue()
+
+
+def profile_call(func, *args, top=30, prefix='profile', **kwargs):
+    """在cProfile和tracemalloc下执行func(*args, **kwargs)，写出报告后返回func的结果（异常照常抛出）"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    pstats_path = f"{prefix}_{timestamp}.pstats"
+    report_path = f"{prefix}_{timestamp}.txt"
+
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    start = time.time()
+    error = None
+    try:
+        profiler.enable()
+        return func(*args, **kwargs)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        profiler.disable()
+        elapsed = time.time() - start
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        try:
+            profiler.dump_stats(pstats_path)
+            rss = peak_rss_mb()
+            rss_text = f"{rss:.1f} MB" if rss is not None else "不支持"
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(f"时间: {timestamp}\n")
+                f.write(f"结果: {'失败: ' + str(error) if error else '成功'}\n")
+                f.write(f"总耗时: {elapsed:.1f} 秒\n")
+                f.write(f"峰值RSS: {rss_text}\n")
+                f.write(f"tracemalloc: 当前 {current / 1024 / 1024:.1f} MB，峰值 {peak / 1024 / 1024:.1f} MB\n\n")
+                f.write(f"===== CPU：按累计耗时前{top} =====\n")
+                f.write(cpu_table(profiler, 'cumulative', top))
+                f.write(f"\n===== CPU：按自身耗时前{top} =====\n")
+                f.write(cpu_table(profiler, 'tottime', top))
+                f.write(f"\n===== 内存：未释放分配前{top}（按代码行） =====\n")
+                f.write(allocation_table(snapshot, top) + "\n")
+            print(f"[调试] 性能剖析已保存到: {report_path}, {pstats_path}，峰值RSS {rss_text}")
+        except Exception as e:
+            print(f"[警告] 保存性能剖析失败: {e}")
@@ -0,0 +1,185 @@
+"""
+    请求分阶段计时：
+    requests只给出整个请求的耗时（response.elapsed），看不出慢在DNS、建连、TLS握手还是等服务器响应；
+    这里替换urllib3连接池使用的连接类，记录每次请求的：
+    - dns:     域名解析耗时
+    - connect: TCP建连耗时
+    - tls:     TLS握手耗时（HTTPS）
+    - ttfb:    请求发出后等待响应头的时间
+    - reused:  是否复用了连接池中已建立的连接（复用时前三项为0）
+    另外统计每个响应体在线上实际读取的字节数（压缩后，分块编码时含分块长度行），用wire_bytes()读取；
+    urllib3的raw.tell()在分块传输时始终为0，不能用来统计
+
+    用法：
+        session.mount('https://', TimingAdapter())
+        begin()
+        response = session.get(url)
+        timing = end()
+    计时保存在线程局部变量中，其他线程（如大模型调用）的请求互不影响；没有调用begin()时不计时
+"""
+import http.client
+import socket
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+
+_local = threading.local()
+
+
+def begin():
+    """开始记录当前线程的一次请求（重定向产生的多次往返累加到一起）"""
+    _local.timing = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "ttfb": 0.0, "reused": None}
+
+
+def end():
+    """结束记录，返回计时字典，没有调用begin()时返回None"""
+    timing = getattr(_local, 'timing', None)
+    _local.timing = None
+    if timing is not None and timing["reused"] is None:
+        # 请求在发出前就失败了
+        timing["reused"] = False
+    return timing
+
+
+def _current():
+    return getattr(_local, 'timing', None)
+
+
+class _CountingReader:
+    """包装响应读取socket的文件对象，累计读出的字节数"""
+
+    def __init__(self, fp, response):
+        self._fp = fp
+        self._response = response
+
+    def _count(self, data):
+        self._response.wire_bytes += len(data)
+        return data
+
+    def read(self, *args):
+        return self._count(self._fp.read(*args))
+
+    def read1(self, *args):
+        return self._count(self._fp.read1(*args))
+
+    def readline(self, *args):
+        return self._count(self._fp.readline(*args))
+
+    def readinto(self, buffer):
+        count = self._fp.readinto(buffer)
+        self._response.wire_bytes += count or 0
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+
+class CountingHTTPResponse(http.client.HTTPResponse):
+    """记录响应体线上字节数的http.client响应"""
+
+    def __init__(self, sock, *args, **kwargs):
+        super().__init__(sock, *args, **kwargs)
+        self.wire_bytes = 0
+        self.fp = _CountingReader(self.fp, self)
+
+    def begin(self):
+        super().begin()
+        # 只统计响应体，不含状态行和响应头
+        self.wire_bytes = 0
+
+
+def wire_bytes(raw):
+    """urllib3响应已读取的响应体线上字节数，不是计时连接产生的响应时返回None"""
+    return getattr(getattr(raw, '_fp', None), 'wire_bytes', None)
+
+
+class TimingConnectionMixin:
+    """在urllib3连接的建连、发送、读取响应头各阶段记录耗时"""
+    response_class = CountingHTTPResponse
+
+    def _new_conn(self):
+        timing = _current()
+        if timing is None:
+            return super()._new_conn()
+
+        # 先单独解析域名以区分DNS和建连耗时，再逐个地址建连（与urllib3的create_connection一致）
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            # 解析失败时交给urllib3处理，抛出它自己的异常
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        timing["dns"] += resolved - start
+
+        error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = host
+            timing["connect"] += time.perf_counter() - resolved
+        self._socket_time = time.perf_counter() - start
+        return sock
+
+    def connect(self):
+        timing = _current()
+        if timing is None:
+            return super().connect()
+        self._socket_time = 0.0
+        start = time.perf_counter()
+        super().connect()
+        timing["reused"] = False
+        # connect()中除去解析和建连的部分是TLS握手（HTTP连接约为0）
+        timing["tls"] += max(0.0, time.perf_counter() - start - self._socket_time)
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        self._request_sent = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        timing = _current()
+        if timing is not None:
+            timing["ttfb"] += time.perf_counter() - self._request_sent
+            if timing["reused"] is None:
+                timing["reused"] = True
+        return response
+
+
+class TimingHTTPConnection(TimingConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimingHTTPSConnection(TimingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimingHTTPConnection
+
+
+class TimingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimingHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """使用计时连接类的HTTPAdapter（不经过代理的请求）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimingHTTPConnectionPool,
+            'https': TimingHTTPSConnectionPool,
+        }
@@ -1,5 +1,7 @@
 import requests
-from bs4 import BeautifulSoup
+# urllib3根据已安装的解码器给出可用的压缩方式：gzip,deflate，装了brotli时加上br，
+# 有compression.zstd（Python 3.14+）或backports.zstd时加上zstd
+from urllib3.util.request import ACCEPT_ENCODING
 import re
 import os
 import argparse
@@ -12,6 +14,8 @@ import base64
 import shutil
 from datetime import datetime, timedelta, timezone
 from dashscope import Application
+from page_parser import extract_fields, parse_html, parse_question, select_backend
+from answer_store import AnswerStore
 
 username = None
 password = None
@@ -26,6 +30,11 @@ log_messages = []
 question_stats = {"correct": 0, "wrong": 0}
 # 积分统计
 money_stats = {"initial": 0, "final": 0}
+# 排除法统计：只剩一个候选直接作答（节省API调用）/ 缩小候选后再调用API
+elimination_stats = {"saved": 0, "narrowed": 0}
+# 错题本（merge中打开）
+answer_db = 'answers.db'
+answer_store = None
 
 def add_log(message):
     """添加日志到推送消息中"""
@@ -58,7 +67,8 @@ class RequestsSession:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            # 只声明能解码的压缩方式，避免服务器返回br/zstd后无法解码
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Ch-Ua': '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
@@ -129,18 +139,18 @@ def verify(session):
             
             # 获取登录页面
             response = session.get(login_url)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            document = parse_html(response.text)
             
             # 提取所有隐藏字段
             hidden_fields = {}
-            for input_tag in soup.find_all('input', type='hidden'):
+            for input_tag in document.find_all('input', type='hidden'):
                 name = input_tag.get('name')
                 value = input_tag.get('value', '')
                 if name:
                     hidden_fields[name] = value
 
             # 处理验证码
-            verify_img = soup.find('img', class_='verifyimg')
+            verify_img = document.find('img', class_='verifyimg')
             if verify_img:
                 img_url = verify_img.get('src')
                 if img_url.startswith('data:'):
@@ -251,10 +261,10 @@ def verify(session):
                     
                     # 输出响应体的前500字符用于快速查看
                     print(f"[调试] 响应体前500字符: {response.text[:500]}...")
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                    document = parse_html(response.text)
                     
                     # 验证是否成功进入登录页面（检查是否还有验证码）
-                    verify_img_check = soup.find('img', class_='verifyimg')
+                    verify_img_check = document.find('img', class_='verifyimg')
                     if verify_img_check:
                         print("[调试] 页面仍有验证码，验证可能失败")
                         continue  # 重试
@@ -264,7 +274,7 @@ def verify(session):
                     
                     # 重新提取隐藏字段
                     hidden_fields = {}
-                    for input_tag in soup.find_all('input', type='hidden'):
+                    for input_tag in document.find_all('input', type='hidden'):
                         name = input_tag.get('name')
                         value = input_tag.get('value', '')
                         if name:
@@ -285,14 +295,14 @@ def login(session):
     
     # 获取登录页面
     response = session.get(login_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    document = parse_html(response.text)
     
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
+    formhash_input = document.find('input', {'name': 'formhash'})
     formhash = formhash_input.get('value') if formhash_input else ''
     
     # 提取loginhash
-    loginhash_input = soup.find('input', {'name': 'loginhash'})
+    loginhash_input = document.find('input', {'name': 'loginhash'})
     loginhash = loginhash_input.get('value') if loginhash_input else ''
     
     print(f"[调试] 提取到formhash: {formhash}")
@@ -355,8 +365,8 @@ def signin(session):
             badge_response = session.get(badge_url)
             
             # 模拟点击领取按钮
-            soup = BeautifulSoup(badge_response.text, 'html.parser')
-            badge_link = soup.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
+            document = parse_html(badge_response.text)
+            badge_link = document.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
             if badge_link:
                 badge_href = badge_link.get('href')
                 if not badge_href.startswith('http'):
@@ -376,10 +386,10 @@ def signin(session):
     
     try:
         # 获取页面表单数据
-        soup = BeautifulSoup(response.text, 'html.parser')
+        document = parse_html(response.text)
         
         # 提取formhash
-        formhash_input = soup.find('input', {'name': 'formhash'})
+        formhash_input = document.find('input', {'name': 'formhash'})
         formhash = formhash_input.get('value') if formhash_input else ''
         
         # 构建签到数据
@@ -414,80 +424,77 @@ def question(session):
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop&infloat=yes&handlekey=pop&inajax=1&ajaxtarget=fwin_content_pop"
 
     try:
+        # 每道题只请求一次题目页面：同一个响应既用来判断是否已完成，也用来解析题目、formhash和选项，
+        # 提交答案后再请求下一题
         response = session.get(base_url)
 
-        time.sleep(1)
-
-        # 检查是否已完成答题
-        if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
-            add_log("今日答题已完成。")
-            return
-
         # 开始答题流程
         question_count = 0
         max_questions = 3  # 设置最大答题数量防止无限循环
         
         while question_count < max_questions:
-            response = session.get(base_url)
-            time.sleep(1)
-            
             # 检查是否还有题目
             if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
                 add_log("今日答题已完成。")
                 break
                 
             try:
-                answer_question(session, question_count)
+                answer_question(session, question_count, response)
                 question_count += 1
             except Exception as e:
                 print(f"答题第{question_count + 1}题过程中出现错误: {e}")
                 save_response_on_failure(response, f"question_{question_count}")
                 time.sleep(5)
-                continue
+            
+            response = session.get(base_url)
                 
     except Exception as e:
         print(f"答题过程中出现错误: {e}")
         add_log("答题失败。")
 
-def answer_question(session, question_number):
+def answer_question(session, question_number, response):
+    """回答question()已获取的题目页面中的题目"""
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop"
-    response = session.get(base_url)
-    print(response)
 
-    question_text, options_dict = parse_question(response.text)
+    question_text, options_dict, radio_values = parse_question(response.text)
     print("===============")
     print(f"题目: {question_text}")
     
     # 先从错题本查找
-    label = search_wrong_answers(question_text, options_dict)
+    label, known_wrong = search_wrong_answers(question_text, options_dict)
     
     if not label:
-        # 错题本没有，调用API
-        prompt = build_prompt(response.text)
+        # 错题本没有确定的答案，排除已知错误选项后调用API
+        candidates = [aid for aid in ['a1', 'a2', 'a3', 'a4'] if aid not in known_wrong]
+        default_label = 'a2' if 'a2' in candidates else candidates[0]
+        if known_wrong:
+            elimination_stats["narrowed"] += 1
+            print(f"排除已知错误选项: {known_wrong}")
+        prompt = build_prompt(response.text, exclude=known_wrong)
         print(prompt)
         label = get_answer_from_api(prompt)
         if not label or label.strip() == '':
-            print("API 未返回结果，默认选择 a2")
-            label = 'a2'
-        if label not in ['a1', 'a2', 'a3', 'a4']:
-            print("API 返回结果不在合法选项中，默认选择 a2")
-            label = 'a2'
-
-    # 构建答题数据
-    soup = BeautifulSoup(response.text, 'html.parser')
+            print(f"API 未返回结果，默认选择 {default_label}")
+            label = default_label
+        if label not in candidates:
+            print(f"API 返回结果不在候选选项中，默认选择 {default_label}")
+            label = default_label
+
+    # 构建答题数据：题目页面是inajax的XML响应，表单在CDATA里，
+    # 用BeautifulSoup解析只能得到一个文本节点，这里按字段直接提取
+    fields = extract_fields(response.text)
     answer_data = {}
 
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
-    if formhash_input:
-        answer_data['formhash'] = formhash_input.get('value', '')
-
-    # 找到对应的radio button并获取其value
-    radio_input = soup.find('input', {'id': label, 'type': 'radio'})
-    if radio_input:
-        answer_data['answer'] = radio_input.get('value', '2')
-    else:
-        answer_data['answer'] = '2'
+    formhash = fields.input_value('formhash')
+    if formhash is not None:
+        answer_data['formhash'] = formhash
+
+    # 找到对应的radio button并获取其value（解析题目时已取出）
+    radio_value = radio_values.get(label)
+    if radio_value is None:
+        radio_value = fields.radio_value(label)
+    answer_data['answer'] = radio_value if radio_value is not None else '2'
 
     answer_data['submit'] = 'true'
 
@@ -514,79 +521,43 @@ def answer_question(session, question_number):
     # 更新错题本
     update_wrong_answers(question_text, label, options_dict, is_correct)
 
-def parse_question(html):
-    """解析题目和选项，返回题目文本和选项字典"""
-    # 提取题目
-    question_match = re.search(r'【题目】</b>&nbsp;([^<]+)', html)
-    question_text = question_match.group(1) if question_match else ""
-    
-    # 提取选项
-    options_dict = {}
-    radio_pattern = r'id="(a\d)"[^>]*>&nbsp;&nbsp;([^<]+)'
-    matches = re.findall(radio_pattern, html, re.DOTALL)
-    
-    for option_id, option_text in matches:
-        options_dict[option_id] = option_text.strip()
-    
-    # 备用方案
-    if len(options_dict) < 4:
-        for i in range(1, 5):
-            aid = f"a{i}"
-            if aid not in options_dict:
-                pattern = rf'id="{aid}"[^>]*>.*?([^<]+)</div>'
-                match = re.search(pattern, html, re.DOTALL)
-                if match:
-                    options_dict[aid] = match.group(1).replace('&nbsp;', ' ').strip()
-    
-    return question_text, options_dict
-
-def build_prompt(html):
-    question_text, options_dict = parse_question(html)
+def build_prompt(html, exclude=()):
+    """构建提示词，exclude中的选项（已知错误）不发给大模型"""
+    question_text, options_dict, _ = parse_question(html)
     
     if not question_text.strip():
         return ""
     
-    options = [f"{k}: {v}" for k, v in sorted(options_dict.items())]
-    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + "\n请选择正确答案，只返回选项ID（如a1、a2、a3、a4）："
+    options = [f"{k}: {v}" for k, v in sorted(options_dict.items()) if k not in exclude]
+    option_ids = "、".join(k for k in ['a1', 'a2', 'a3', 'a4'] if k not in exclude)
+    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + f"\n请选择正确答案，只返回选项ID（如{option_ids}）："
     
     return prompt
 
 def search_wrong_answers(question_text, options_dict):
-    """从错题本中搜索答案"""
-    import random
-    
-    if not os.path.exists('wrong.txt'):
-        return None
-    
+    """从错题本中搜索答案，返回(答案, 已知错误选项)，无法确定答案时答案为None"""
     try:
-        with open('wrong.txt', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找题目
-        if question_text not in content:
-            return None
-        
-        # 提取该题的答案
-        pattern = re.escape(question_text) + r'\n((?:a[1-4]: [^\n]+(?:, )?)+)'
-        match = re.search(pattern, content)
-        if not match:
-            return None
+        entry = answer_store.get(question_text, options_dict)
+        if not entry:
+            return None, []
         
-        answers_line = match.group(1)
-        # 提取所有答案选项 (a1, a2, a3, a4)
-        answer_ids = re.findall(r'a[1-4]', answers_line)
+        if entry["correct"]:
+            print(f"从错题本找到正确答案: {entry['correct']}")
+            return entry["correct"], entry["wrong"]
         
-        if not answer_ids:
-            return None
-        
-        # 随机选择一个答案
-        selected = random.choice(answer_ids)
-        print(f"从错题本找到答案，随机选择: {selected}")
-        return selected
+        # 排除已知错误选项，只剩一个时直接作答
+        candidates = [aid for aid in ['a1', 'a2', 'a3', 'a4'] if aid not in entry["wrong"]]
+        if not candidates:
+            return None, []
+        if len(candidates) == 1:
+            elimination_stats["saved"] += 1
+            print(f"排除已知错误选项 {entry['wrong']} 后只剩 {candidates[0]}，无需调用API")
+            return candidates[0], entry["wrong"]
+        return None, entry["wrong"]
         
     except Exception as e:
         print(f"读取错题本失败: {e}")
-        return None
+        return None, []
 
 def update_wrong_answers(question_text, answer_id, options_dict, is_correct):
     """更新错题本"""
@@ -594,49 +565,7 @@ def update_wrong_answers(question_text, answer_id, options_dict, is_correct):
         return
     
     try:
-        # 读取现有内容
-        existing_content = ""
-        if os.path.exists('wrong.txt'):
-            with open('wrong.txt', 'r', encoding='utf-8') as f:
-                existing_content = f.read()
-        
-        # 查找是否已有该题
-        pattern = re.escape(question_text) + r'\n((?:a[1-4]: [^\n]+(?:, )?)+)'
-        match = re.search(pattern, existing_content)
-        
-        if match:
-            # 已有该题
-            answers_line = match.group(1)
-            answer_ids = re.findall(r'a[1-4]', answers_line)
-            
-            if is_correct:
-                # 答对了，只保留这个答案
-                new_line = f"{question_text}\n{answer_id}: {options_dict.get(answer_id, '')}"
-            else:
-                # 答错了，添加到列表（如果不存在）
-                if answer_id not in answer_ids:
-                    answer_ids.append(answer_id)
-                # 构建新的答案行
-                answer_parts = [f"{aid}: {options_dict.get(aid, '')}" for aid in sorted(answer_ids)]
-                new_line = f"{question_text}\n{', '.join(answer_parts)}"
-            
-            # 替换旧内容
-            existing_content = re.sub(
-                re.escape(question_text) + r'\n(?:a[1-4]: [^\n]+(?:, )?)+',
-                new_line,
-                existing_content
-            )
-        else:
-            # 新题目
-            if not is_correct:
-                # 只有答错才记录
-                new_line = f"{question_text}\n{answer_id}: {options_dict.get(answer_id, '')}\n"
-                existing_content += ("\n" if existing_content and not existing_content.endswith("\n") else "") + new_line
-        
-        # 写回文件
-        with open('wrong.txt', 'w', encoding='utf-8') as f:
-            f.write(existing_content)
-            
+        answer_store.record(question_text, options_dict, answer_id, is_correct)
     except Exception as e:
         print(f"更新错题本失败: {e}")
 
@@ -685,9 +614,9 @@ def lottery(session):
         # 获取抽奖页面的formhash
         url = f"{address}/forum/plugin.php?id=gplayconstellation:front"
         response = session.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        document = parse_html(response.text)
         
-        formhash_input = soup.find('input', {'name': 'formhash'})
+        formhash_input = document.find('input', {'name': 'formhash'})
         formhash = formhash_input.get('value') if formhash_input else ''
         
         # 第一步：获取抽奖结果
@@ -768,6 +697,12 @@ def sendPushplus(msg):
 def merge(local: bool):
     global username, password, pushplus_token
 
+    # 打开错题本
+    global answer_store
+    answer_store = AnswerStore(answer_db)
+    # 模糊匹配索引在后台提前建立，不占用答题时间
+    answer_store.build_index_async()
+    
     # 创建会话
     req_session = RequestsSession()
     
@@ -827,6 +762,8 @@ def merge(local: bool):
     # 答题前随机等待
     random_wait()
     question(req_session.session)
+    if elimination_stats["saved"] or elimination_stats["narrowed"]:
+        add_log(f"排除法节省API调用{elimination_stats['saved']}次，缩小候选{elimination_stats['narrowed']}次。")
     
     # 抽奖前随机等待
     random_wait()
@@ -840,13 +777,22 @@ def merge(local: bool):
     
     # 任务完成后再次保存cookies
     req_session.save_cookies()
+    answer_store.close()
 
 def main():
     global username, password, pushplus_token, api_key, app_id, address
+    global answer_db
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--local', action='store_true', help='Use local config')
+    parser.add_argument('--parser', choices=['selectolax', 'lxml', 'html.parser'],
+                        help='Force HTML parser backend (or set PAGE_PARSER)')
+    parser.add_argument('--answer-db', default=os.environ.get('ANSWER_DB', answer_db),
+                        help='SQLite answer store path (or set ANSWER_DB)')
     args = parser.parse_args()
+    answer_db = args.answer_db
+    if args.parser:
+        select_backend(args.parser)
     
     # 配置加载
     try:
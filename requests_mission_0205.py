@@ -1,5 +1,7 @@
 import requests
-from bs4 import BeautifulSoup
+# urllib3根据已安装的解码器给出可用的压缩方式：gzip,deflate，装了brotli时加上br，
+# 有compression.zstd（Python 3.14+）或backports.zstd时加上zstd
+from urllib3.util.request import ACCEPT_ENCODING
 import re
 import os
 import argparse
@@ -11,6 +13,8 @@ import base64
 import shutil
 from datetime import datetime, timedelta, timezone
 from dashscope import Application
+from page_parser import extract_fields, parse_html, parse_question, select_backend
+from answer_store import AnswerStore
 """
     四次请求验证流程：
     1. 第一次请求：不携带cookies，获取security_session_verify
@@ -31,6 +35,11 @@ log_messages = []
 question_stats = {"correct": 0, "wrong": 0}
 # 积分统计
 money_stats = {"initial": 0, "final": 0}
+# 排除法统计：只剩一个候选直接作答（节省API调用）/ 缩小候选后再调用API
+elimination_stats = {"saved": 0, "narrowed": 0}
+# 答案缓存（merge中打开）
+answer_db = 'answers.db'
+answer_store = None
 
 def add_log(message):
     """添加日志到推送消息中"""
@@ -63,7 +72,8 @@ class RequestsSession:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            # 只声明能解码的压缩方式，避免服务器返回br/zstd后无法解码
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Ch-Ua': '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
@@ -252,10 +262,9 @@ def verify(session):
                     break
             
             # 验证是否成功进入登录页面（检查是否还有验证码图片）
-            soup = BeautifulSoup(response.text, 'html.parser')
-            verify_img_check = soup.find('img', class_='verifyimg')
+            fields = extract_fields(response.text)
             
-            if verify_img_check:
+            if fields.has_marker('img', 'verifyimg'):
                 print("[调试] 页面仍有验证码，验证可能失败")
                 # 输出响应体的前500字符用于调试
                 print(f"[调试] 响应体前500字符: {response.text[:500]}...")
@@ -333,18 +342,16 @@ def login(session):
     
     # 获取登录页面
     response = session.get(login_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    fields = extract_fields(response.text)
     
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
-    formhash = formhash_input.get('value') if formhash_input else ''
+    formhash = fields.input_value('formhash') or ''
     
     # 提取loginhash - 从登录表单的action属性中提取
     # 表单action格式: member.php?mod=logging&action=login&loginsubmit=yes&loginhash=LQ9Xl
     loginhash = ''
-    login_form = soup.find('form', {'name': 'login'})
-    if login_form:
-        action = login_form.get('action', '')
+    action = fields.form_action('login')
+    if action:
         # 从action URL中提取loginhash参数
         loginhash_match = re.search(r'loginhash=([^&]+)', action)
         if loginhash_match:
@@ -431,8 +438,8 @@ def signin(session):
             badge_response = session.get(badge_url)
             
             # 模拟点击领取按钮
-            soup = BeautifulSoup(badge_response.text, 'html.parser')
-            badge_link = soup.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
+            document = parse_html(badge_response.text)
+            badge_link = document.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
             if badge_link:
                 badge_href = badge_link.get('href')
                 if not badge_href.startswith('http'):
@@ -452,11 +459,10 @@ def signin(session):
     
     try:
         # 获取页面表单数据
-        soup = BeautifulSoup(response.text, 'html.parser')
+        fields = extract_fields(response.text)
         
         # 提取formhash
-        formhash_input = soup.find('input', {'name': 'formhash'})
-        formhash = formhash_input.get('value') if formhash_input else ''
+        formhash = fields.input_value('formhash') or ''
         
         # 构建签到数据
         signin_data = {
@@ -490,76 +496,89 @@ def question(session):
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop&infloat=yes&handlekey=pop&inajax=1&ajaxtarget=fwin_content_pop"
 
     try:
+        # 每道题只请求一次题目页面：同一个响应既用来判断是否已完成，也用来解析题目、formhash和选项，
+        # 提交答案后再请求下一题
         response = session.get(base_url)
 
-        time.sleep(1)
-
-        # 检查是否已完成答题
-        if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
-            add_log("今日答题已完成。")
-            return
-
         # 开始答题流程
         question_count = 0
         max_questions = 3  # 设置最大答题数量防止无限循环
         
         while question_count < max_questions:
-            response = session.get(base_url)
-            time.sleep(1)
-            
             # 检查是否还有题目
             if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
                 add_log("今日答题已完成。")
                 break
                 
             try:
-                answer_question(session, question_count)
+                answer_question(session, question_count, response)
                 question_count += 1
             except Exception as e:
                 print(f"答题第{question_count + 1}题过程中出现错误: {e}")
                 save_response_on_failure(response, f"question_{question_count}")
                 time.sleep(5)
-                continue
+            
+            response = session.get(base_url)
                 
     except Exception as e:
         print(f"答题过程中出现错误: {e}")
         add_log("答题失败。")
 
-def answer_question(session, question_number):
+def answer_question(session, question_number, response):
+    """回答question()已获取的题目页面中的题目"""
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop"
-    response = session.get(base_url)
-    print(response)
 
-    question_text, options_dict = parse_question(response.text)
+    question_text, options_dict, radio_values = parse_question(response.text)
     print("===============")
     print(f"题目: {question_text}")
     
-    # 调用API获取答案
-    prompt = build_prompt(response.text)
-    print(prompt)
-    label = get_answer_from_api(prompt)
-    if not label or label.strip() == '':
-        print("API 未返回结果，默认选择 a2")
-        label = 'a2'
-    if label not in ['a1', 'a2', 'a3', 'a4']:
-        print("API 返回结果不在合法选项中，默认选择 a2")
-        label = 'a2'
+    # 先查答案缓存，命中确认正确的答案时不再调用API
+    label = answer_store.lookup(question_text, options_dict) if answer_store else None
+    if label:
+        print(f"答案缓存命中: {label}")
+    else:
+        # 排除已知错误的选项
+        entry = answer_store.last_entry if answer_store else None
+        known_wrong = entry["wrong"] if entry else []
+        candidates = [aid for aid in ['a1', 'a2', 'a3', 'a4'] if aid not in known_wrong]
+        if not candidates:
+            known_wrong = []
+            candidates = ['a1', 'a2', 'a3', 'a4']
+        default_label = 'a2' if 'a2' in candidates else candidates[0]
+        
+        if len(candidates) == 1:
+            label = candidates[0]
+            elimination_stats["saved"] += 1
+            print(f"排除已知错误选项 {known_wrong} 后只剩 {label}，无需调用API")
+        else:
+            if known_wrong:
+                elimination_stats["narrowed"] += 1
+                print(f"排除已知错误选项: {known_wrong}")
+            # 调用API获取答案
+            prompt = build_prompt(response.text, exclude=known_wrong)
+            print(prompt)
+            label = get_answer_from_api(prompt)
+            if not label or label.strip() == '':
+                print(f"API 未返回结果，默认选择 {default_label}")
+                label = default_label
+            if label not in candidates:
+                print(f"API 返回结果不在候选选项中，默认选择 {default_label}")
+                label = default_label
 
     # 构建答题数据
-    soup = BeautifulSoup(response.text, 'html.parser')
+    fields = extract_fields(response.text)
     answer_data = {}
 
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
-    if formhash_input:
-        answer_data['formhash'] = formhash_input.get('value', '')
-
-    # 找到对应的radio button并获取其value
-    radio_input = soup.find('input', {'id': label, 'type': 'radio'})
-    if radio_input:
-        answer_data['answer'] = radio_input.get('value', '2')
-    else:
-        answer_data['answer'] = '2'
+    formhash = fields.input_value('formhash')
+    if formhash is not None:
+        answer_data['formhash'] = formhash
+
+    # 找到对应的radio button并获取其value（解析题目时已取出）
+    radio_value = radio_values.get(label)
+    if radio_value is None:
+        radio_value = fields.radio_value(label)
+    answer_data['answer'] = radio_value if radio_value is not None else '2'
 
     answer_data['submit'] = 'true'
 
@@ -573,98 +592,28 @@ def answer_question(session, question_number):
         money = money_match.group(1) if money_match else '0'
         question_stats["correct"] += 1
         add_log(f"第{question_number + 1}题回答正确，获得{money}金钱")
+        if answer_store:
+            answer_store.record(question_text, options_dict, label, True)
     elif '回答错误！扣除' in submit_response.text:
         money_match = re.search(r'扣除(\d+)金钱', submit_response.text)
         money = money_match.group(1) if money_match else '0'
         question_stats["wrong"] += 1
         add_log(f"第{question_number + 1}题回答错误，扣除{money}金钱")
-        # 保存错题到wrong.json
-        save_wrong_question(question_text, label, options_dict)
+        if answer_store:
+            answer_store.record(question_text, options_dict, label, False)
     else:
         add_log(f"第{question_number + 1}题答题完成，结果未知")
 
-def save_wrong_question(question_text, answer_id, options_dict):
-    """将错题保存到wrong.json文件"""
-    if not question_text or not answer_id:
-        return
-    
-    wrong_file = 'wrong.json'
-    wrong_data = []
-    
-    try:
-        # 读取现有的错题数据
-        if os.path.exists(wrong_file):
-            with open(wrong_file, 'r', encoding='utf-8') as f:
-                wrong_data = json.load(f)
-        
-        # 构建错题记录
-        wrong_entry = {
-            "question": question_text,
-            "wrong_answer": answer_id,
-            "wrong_answer_text": options_dict.get(answer_id, ''),
-            "options": options_dict,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # 检查是否已存在相同题目
-        existing_index = None
-        for i, entry in enumerate(wrong_data):
-            if entry.get("question") == question_text:
-                existing_index = i
-                break
-        
-        if existing_index is not None:
-            # 更新已存在的记录
-            wrong_data[existing_index] = wrong_entry
-            print(f"更新错题记录: {question_text[:30]}...")
-        else:
-            # 添加新记录
-            wrong_data.append(wrong_entry)
-            print(f"添加新错题记录: {question_text[:30]}...")
-        
-        # 写回文件
-        with open(wrong_file, 'w', encoding='utf-8') as f:
-            json.dump(wrong_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"错题已保存到 {wrong_file}")
-        
-    except Exception as e:
-        print(f"保存错题失败: {e}")
-
-def parse_question(html):
-    """解析题目和选项，返回题目文本和选项字典"""
-    # 提取题目
-    question_match = re.search(r'【题目】</b>&nbsp;([^<]+)', html)
-    question_text = question_match.group(1) if question_match else ""
-    
-    # 提取选项
-    options_dict = {}
-    radio_pattern = r'id="(a\d)"[^>]*>&nbsp;&nbsp;([^<]+)'
-    matches = re.findall(radio_pattern, html, re.DOTALL)
-    
-    for option_id, option_text in matches:
-        options_dict[option_id] = option_text.strip()
-    
-    # 备用方案
-    if len(options_dict) < 4:
-        for i in range(1, 5):
-            aid = f"a{i}"
-            if aid not in options_dict:
-                pattern = rf'id="{aid}"[^>]*>.*?([^<]+)</div>'
-                match = re.search(pattern, html, re.DOTALL)
-                if match:
-                    options_dict[aid] = match.group(1).replace('&nbsp;', ' ').strip()
-    
-    return question_text, options_dict
-
-def build_prompt(html):
-    question_text, options_dict = parse_question(html)
+def build_prompt(html, exclude=()):
+    """构建提示词，exclude中的选项（已知错误）不发给大模型"""
+    question_text, options_dict, _ = parse_question(html)
     
     if not question_text.strip():
         return ""
     
-    options = [f"{k}: {v}" for k, v in sorted(options_dict.items())]
-    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + "\n请选择正确答案，只返回选项ID（如a1、a2、a3、a4）："
+    options = [f"{k}: {v}" for k, v in sorted(options_dict.items()) if k not in exclude]
+    option_ids = "、".join(k for k in ['a1', 'a2', 'a3', 'a4'] if k not in exclude)
+    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + f"\n请选择正确答案，只返回选项ID（如{option_ids}）："
     
     return prompt
 
@@ -713,10 +662,8 @@ def lottery(session):
         # 获取抽奖页面的formhash
         url = f"{address}/forum/plugin.php?id=gplayconstellation:front"
         response = session.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        formhash_input = soup.find('input', {'name': 'formhash'})
-        formhash = formhash_input.get('value') if formhash_input else ''
+        fields = extract_fields(response.text)
+        formhash = fields.input_value('formhash') or ''
         
         # 第一步：获取抽奖结果
         game_result_url = f"{address}/forum/plugin.php?id=gplayconstellation:front&mod=index&formhash={formhash}&act=game_result&inajax=1&ajaxtarget=myaward"
@@ -796,6 +743,12 @@ def sendPushplus(msg):
 def merge(local: bool):
     global username, password, pushplus_token
 
+    # 打开答案缓存
+    global answer_store
+    answer_store = AnswerStore(answer_db)
+    # 模糊匹配索引在后台提前建立，不占用答题时间
+    answer_store.build_index_async()
+    
     # 创建会话
     req_session = RequestsSession()
     
@@ -855,6 +808,10 @@ def merge(local: bool):
     # 答题前随机等待
     random_wait()
     question(req_session.session)
+    if answer_store.lookups:
+        add_log(answer_store.summary())
+    if elimination_stats["saved"] or elimination_stats["narrowed"]:
+        add_log(f"排除法节省API调用{elimination_stats['saved']}次，缩小候选{elimination_stats['narrowed']}次。")
     
     # 抽奖前随机等待
     random_wait()
@@ -868,13 +825,22 @@ def merge(local: bool):
     
     # 任务完成后再次保存cookies
     req_session.save_cookies()
+    answer_store.close()
 
 def main():
     global username, password, pushplus_token, api_key, app_id, address
+    global answer_db
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--local', action='store_true', help='Use local config')
+    parser.add_argument('--parser', choices=['selectolax', 'lxml', 'html.parser'],
+                        help='Force HTML parser backend (or set PAGE_PARSER)')
+    parser.add_argument('--answer-db', default=os.environ.get('ANSWER_DB', answer_db),
+                        help='SQLite answer cache path (or set ANSWER_DB)')
     args = parser.parse_args()
+    answer_db = args.answer_db
+    if args.parser:
+        select_backend(args.parser)
     
     # 配置加载
     try:
@@ -1,16 +1,31 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 import os
 import argparse
 import json
 import time
+import queue
+import threading
 from PIL import Image
 from io import BytesIO
 import base64
 import shutil
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+# urllib3根据已安装的解码器给出可用的压缩方式：gzip,deflate，装了brotli时加上br，
+# 有compression.zstd（Python 3.14+）或backports.zstd时加上zstd
+from urllib3.util.request import ACCEPT_ENCODING
 from dashscope import Application
+from page_parser import extract_fields, parse_html, parse_question, select_backend
+from answer_store import AnswerStore
+from local_ranker import LocalRanker
+from answer_router import AnswerRouter
+import request_timing
+import tracing
+import profiling
+from run_history import RunHistory, percentile
+import metrics_export
+from contextlib import contextmanager
 
 """
     四次请求验证流程：
@@ -32,6 +47,68 @@ log_messages = []
 question_stats = {"correct": 0, "wrong": 0}
 # 积分统计
 money_stats = {"initial": 0, "final": 0}
+# 排除法统计：只剩一个候选直接作答（节省API调用）/ 缩小候选后再调用API
+elimination_stats = {"saved": 0, "narrowed": 0}
+# 答案缓存（merge中打开）
+answer_db = 'answers.db'
+answer_store = None
+# 题目模糊匹配的相似度阈值，0表示关闭
+fuzzy_threshold = 0.8
+# 本地排序器（merge开始时在后台线程中根据答案缓存建立）
+local_ranker = None
+local_ranker_thread = None
+# 答题策略路由（merge中创建）：按顺序尝试各策略，置信度达到route_confidence即停止；
+# auto_order开启时按历史耗时和准确率自动调整顺序
+answer_router = None
+answer_strategies = ['exact', 'fuzzy', 'elimination', 'warm', 'ranker', 'llm']
+route_confidence = 0.9
+route_auto_order = True
+# 大模型调用记录：每次调用的耗时、结果（ok/hedge/timeout/error）和是否发起了对冲调用
+api_calls = []
+# 单次大模型请求的耗时（启动时载入答案库中最近HEDGE_WINDOW次的历史耗时），用于计算对冲阈值
+api_latencies = []
+HEDGE_WINDOW = 200
+
+# 大模型调用的硬超时（秒）和每道题的总时间预算（秒）
+api_timeout = 120
+answer_budget = 150
+# 对冲调用：第一次调用超过历史耗时的该分位数仍未返回时，再发起一次相同的调用
+hedge_enabled = False
+hedge_percentile = 90
+# 样本不足时使用的对冲阈值（秒）
+hedge_default_delay = 15
+# 流式调用：出现完整的选项标签后立即停止接收
+api_stream = False
+# 多模型投票：同一提示词同时发给APP_ID和这些智能体应用，按各应用的历史准确率加权投票；
+# 第一票到达后最多再等ensemble_grace秒，领先票数已无法被反超时提前结束
+ensemble_apps = []
+ensemble_grace = 5
+# 当前题目各应用的投票(应用, 标签, 耗时)，答题结果出来后记录对错
+ensemble_votes = []
+# 本次运行各应用的投票统计：应用 -> {"votes", "correct", "judged", "latency"}
+ensemble_stats = {}
+# 每个HTTP请求的埋点事件（步骤、分阶段耗时、字节数）逐行追加到该JSONL文件，默认不写；
+# 文件只会追加，长期开启时需要自行轮转
+request_log = ''
+# 运行结束后导出追踪数据（Chrome trace JSON，另写同名.folded文件），空字符串表示不导出
+trace_file = ''
+# 性能剖析：用cProfile和tracemalloc执行merge，报告保存在失败日志旁边；profile_top为各表格的行数
+profile_enabled = False
+profile_top = 30
+# 运行历史数据库，每次运行结束追加一行，空字符串表示不记录
+history_db = 'run_history.db'
+# 运行结束后写出指标文件（供node_exporter textfile collector采集），空字符串表示不写；
+# 默认为node_exporter能解析的Prometheus文本格式，metrics_format为openmetrics时输出OpenMetrics格式
+metrics_file = ''
+metrics_format = 'prometheus'
+# 当前运行的会话（merge中创建），运行结束后汇总请求统计
+current_session = None
+
+# 大模型返回中的选项标签
+LABEL_RE = re.compile(r'\ba[1-4]\b')
+# 响应头和页面开头声明的编码
+HEADER_CHARSET_RE = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+BODY_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)|<\?xml[^>]+encoding=["\']([\w-]+)', re.IGNORECASE)
 
 def add_log(message):
     """添加日志到推送消息中"""
@@ -55,16 +132,230 @@ def random_wait():
     import random
     wait_time = random.randint(10, 13)
     print(f"[调试] 随机等待 {wait_time} 秒...")
-    time.sleep(wait_time)
+    tracing.sleep(wait_time, "random_wait")
+
+class CachedSession(requests.Session):
+    """带单次运行页面缓存的Session：GET按规范化URL和身份cookies缓存，POST使同一插件的缓存失效"""
+    # 参与缓存键的身份cookies，其余cookies（lastact等）每次请求都会变化
+    key_cookies = ('security_session_verify', 'sNgB_2132_saltkey', 'sNgB_2132_auth')
+
+    def __init__(self, event_log=None):
+        super().__init__()
+        self.mount('http://', request_timing.TimingAdapter())
+        self.mount('https://', request_timing.TimingAdapter())
+        self.page_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 每个站点的页面编码，第一次遇到时确定
+        self.encodings = {}
+        # 传输统计：请求数、线上字节数（压缩后）、解码后字节数，按Content-Encoding分别统计
+        self.transfer_stats = {}
+        # 当前步骤名（verify/login/signin/question/lottery/getMoney），由merge设置
+        self.step = None
+        # 每次请求的埋点事件，同时追加写入event_log（JSONL，None表示不写文件）
+        self.events = []
+        self.event_log = event_log
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    def request(self, method, url, *args, **kwargs):
+        with tracing.span(f"{method.upper()} {urlsplit(url).path}", url=self._url_template(url)) as span_args:
+            request_timing.begin()
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except Exception as e:
+                self._record_event(method, url, None, time.perf_counter() - start, request_timing.end(), error=e)
+                raise
+            self._apply_encoding(response)
+            wire = decoded = None
+            if not kwargs.get('stream'):
+                # 读取完响应体后再统计耗时和字节数
+                decoded = len(response.content)
+                wire = self._wire_bytes(response, decoded)
+            self._record_event(method, url, response, time.perf_counter() - start, request_timing.end(), wire, decoded)
+            span_args["status"] = response.status_code
+        return response
+
+    def _wire_bytes(self, response, decoded):
+        """
+        响应体在线上传输的字节数：优先用计时连接实际读取的字节数；
+        raw.tell()在分块传输时为0，只在非0时使用，否则用Content-Length；都没有时返回None（未知）
+        """
+        wire = request_timing.wire_bytes(response.raw)
+        if wire is not None:
+            return wire
+        if hasattr(response.raw, 'tell') and response.raw.tell():
+            return response.raw.tell()
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit():
+            return int(length)
+        return 0 if decoded == 0 else None
+
+    def _url_template(self, url):
+        """URL模板：含数字或很长的查询参数值（formhash、验证数据、时间戳等）替换为{参数名}"""
+        parts = urlsplit(url)
+        query = "&".join(
+            f"{name}={{{name}}}" if any(char.isdigit() for char in value) or len(value) > 32 else f"{name}={value}"
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        )
+        return parts.path + (f"?{query}" if query else "")
+
+    def _record_event(self, method, url, response, total, timing, wire=None, decoded=None, error=None):
+        """记录一次请求的埋点事件"""
+        timing = timing or {}
+        event = {
+            "run": self.run_id,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "step": self.step,
+            "method": method.upper(),
+            "url": self._url_template(url),
+            "status": response.status_code if response is not None else None,
+            "dns": round(timing.get("dns", 0.0), 4),
+            "connect": round(timing.get("connect", 0.0), 4),
+            "tls": round(timing.get("tls", 0.0), 4),
+            "ttfb": round(timing.get("ttfb", 0.0), 4),
+            "total": round(total, 4),
+            "wire": wire,
+            "decoded": decoded,
+            "encoding": response.headers.get('Content-Encoding', 'identity') if response is not None else None,
+            "reused": timing.get("reused"),
+            "error": str(error) if error else None,
+        }
+        self.events.append(event)
+
+        if decoded is not None:
+            stats = self.transfer_stats.setdefault(event["encoding"],
+                                                   {"requests": 0, "wire": 0, "decoded": 0, "unknown": 0})
+            stats["requests"] += 1
+            if wire is None:
+                # 线上字节数未知的响应不参与节省比例的计算
+                stats["unknown"] += 1
+            else:
+                stats["wire"] += wire
+                stats["decoded"] += decoded
+        connection = "复用连接" if event["reused"] else (f"DNS {event['dns']:.3f} 连接 {event['connect']:.3f} "
+                                                       f"TLS {event['tls']:.3f}")
+        wire_text = "未知" if wire is None else f"{wire} 字节"
+        print(f"[调试] {event['step']} {event['method']} {event['url']} {event['status']}: 总耗时 {total:.3f} 秒"
+              f"（{connection}，首字节 {event['ttfb']:.3f}），传输 {wire_text}，解码后 {decoded} 字节")
+
+        if self.event_log:
+            try:
+                with open(self.event_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"[警告] 写入请求事件失败: {e}")
+
+    def event_summary(self):
+        """各步骤的请求次数和总耗时（从高到低），用于推送日志"""
+        steps = {}
+        for event in self.events:
+            count, total = steps.get(event["step"], (0, 0.0))
+            steps[event["step"]] = (count + 1, total + event["total"])
+        parts = [f"{step}{count}次{total:.1f}秒" for step, (count, total)
+                 in sorted(steps.items(), key=lambda item: -item[1][1])]
+        return "请求耗时：" + "，".join(parts) + "。"
+
+    def transfer_summary(self):
+        """各压缩方式的传输量，用于推送日志"""
+        parts = []
+        for content_encoding, stats in sorted(self.transfer_stats.items()):
+            known = stats["requests"] - stats["unknown"]
+            text = f"{content_encoding} {stats['requests']}次"
+            if known:
+                saved = 1 - stats["wire"] / stats["decoded"] if stats["decoded"] else 0
+                text += f" {stats['wire'] / 1024:.0f}KB/{stats['decoded'] / 1024:.0f}KB（节省{saved:.0%}）"
+            if stats["unknown"]:
+                text += f"（{stats['unknown']}次传输量未知）"
+            parts.append(text)
+        return "传输量（线上/解码后）：" + "，".join(parts) + "。"
+
+    def _apply_encoding(self, response):
+        """
+        使用站点缓存的编码解码页面：响应头没有声明charset时，requests每次读取response.text
+        都会对整个页面做编码探测（中文页面尤其慢），这里每个站点只确定一次
+        """
+        host = urlsplit(response.url).netloc.lower()
+        content_type = response.headers.get('Content-Type', '')
+        declared = HEADER_CHARSET_RE.search(content_type)
+        if declared:
+            self.encodings.setdefault(host, declared.group(1).lower())
+            return
+        encoding = self.encodings.get(host)
+        if encoding is None:
+            # 只从页面类响应学习编码，验证码图片等二进制内容不参与
+            if not any(kind in content_type for kind in ('html', 'xml', 'text')):
+                return
+            match = BODY_CHARSET_RE.search(response.content[:2048])
+            if match:
+                encoding = (match.group(1) or match.group(2)).decode('ascii').lower()
+            else:
+                encoding = response.apparent_encoding
+            if not encoding:
+                return
+            self.encodings[host] = encoding
+            print(f"[调试] {host} 页面编码: {encoding}")
+        response.encoding = encoding
+
+    def _normalize_url(self, url):
+        """规范化URL：scheme/host小写，查询参数排序，去掉锚点"""
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+    def _cache_scope(self, url):
+        """缓存失效范围：同一路径下的同一插件（plugin.php的id）或同一模块（mod）"""
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        if 'id' in query:
+            target = query['id'].split(':')[0]
+        else:
+            target = query.get('mod', '')
+        return (parts.path.lower(), target)
+
+    def _cache_key(self, url):
+        cookies = {}
+        for cookie in self.cookies:
+            if cookie.name in self.key_cookies:
+                cookies[cookie.name] = cookie.value
+        return (self._normalize_url(url), tuple(sorted(cookies.items())))
+
+    def get(self, url, fresh=False, **kwargs):
+        """GET请求，fresh=True时跳过缓存直接请求（结果仍会写入缓存）"""
+        # 带额外参数或请求头的请求不缓存
+        if kwargs.get('params') or kwargs.get('headers'):
+            return super().get(url, **kwargs)
+        
+        key = self._cache_key(url)
+        if not fresh:
+            if key in self.page_cache:
+                self.cache_hits += 1
+                print(f"[调试] 页面缓存命中: {url}")
+                return self.page_cache[key]
+            self.cache_misses += 1
+        
+        response = super().get(url, **kwargs)
+        if response.status_code == 200:
+            self.page_cache[key] = response
+        return response
+
+    def post(self, url, data=None, json=None, **kwargs):
+        """POST请求，提交后清除同一插件/模块下的缓存页面"""
+        scope = self._cache_scope(url)
+        for key in list(self.page_cache):
+            if self._cache_scope(key[0]) == scope:
+                del self.page_cache[key]
+        return super().post(url, data=data, json=json, **kwargs)
 
 class RequestsSession:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, reuse_cookies=False, event_log=None):
+        self.session = CachedSession(event_log=event_log)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            # 只声明能解码的压缩方式，避免服务器返回br/zstd后无法解码
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Ch-Ua': '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
@@ -76,10 +367,50 @@ class RequestsSession:
             'Sec-Fetch-User': '?1'
         })
         self.cookie_file = 'session_cookies.json'
+        # 是否复用上次保存的cookies（需要先校验是否仍然有效）
+        self.reuse_cookies = reuse_cookies
+        self.cookies_loaded = False
+        # 各步骤累计耗时（秒），同一步骤多次进入时累加
+        self.step_durations = {}
         self.load_cookies()
     
+    @property
+    def events(self):
+        """本次运行每个请求的埋点事件"""
+        return self.session.events
+    
+    def set_step(self, step):
+        """设置当前步骤名，之后的请求事件都记在该步骤下"""
+        self.session.step = step
+    
+    @contextmanager
+    def step(self, step):
+        """进入一个步骤：设置步骤名并记录追踪span"""
+        self.set_step(step)
+        start = time.perf_counter()
+        try:
+            with tracing.span(step):
+                yield
+        finally:
+            self.step_durations[step] = self.step_durations.get(step, 0.0) + time.perf_counter() - start
+    
     def load_cookies(self):
-        """不加载cookies，每次都重新获取"""
+        """加载cookies：复用模式下从文件恢复，否则删除旧文件每次重新获取"""
+        if self.reuse_cookies:
+            if not os.path.exists(self.cookie_file):
+                print("[调试] 未找到已保存的cookies文件")
+                return
+            try:
+                with open(self.cookie_file, 'r') as f:
+                    cookies_dict = json.load(f)
+                for name, value in cookies_dict.items():
+                    self.session.cookies.set(name, value, path='/')
+                self.cookies_loaded = len(cookies_dict) > 0
+                print(f"[调试] 已加载 {len(cookies_dict)} 个cookies")
+            except Exception as e:
+                print(f"[调试] 加载cookies失败: {e}")
+            return
+        
         print("[调试] 跳过cookies加载，每次重新获取")
         # 删除旧的cookies文件
         if os.path.exists(self.cookie_file):
@@ -137,144 +468,144 @@ def verify(session):
     srcurl_value = "68747470733a2f2f7777772e6561736f6e66616e732e636f6d2f464f52554d2f6d656d6265722e7068703f6d6f643d6c6f6767696e6726616374696f6e3d6c6f67696e"
     
     for attempt in range(max_retries):
-        try:
-            print(f"[调试] 验证尝试 {attempt + 1}/{max_retries}")
+        with tracing.span("verify_attempt", attempt=attempt + 1):
+            try:
+                print(f"[调试] 验证尝试 {attempt + 1}/{max_retries}")
             
-            # ========== 第一次请求 ==========
-            # 清除所有cookies，确保不携带任何cookies
-            session.cookies.clear()
-            print("[调试] 第一次请求：清除所有cookies")
+                # ========== 第一次请求 ==========
+                # 清除所有cookies，确保不携带任何cookies
+                session.cookies.clear()
+                print("[调试] 第一次请求：清除所有cookies")
             
-            response = session.get(login_url)
-            print(f"[调试] 第一次请求状态: {response.status_code}")
+                response = session.get(login_url, fresh=True)
+                print(f"[调试] 第一次请求状态: {response.status_code}")
             
-            # 获取security_session_verify cookie
-            security_session_verify = None
-            for cookie in session.cookies:
-                if cookie.name == 'security_session_verify':
-                    security_session_verify = cookie.value
-                    print(f"[调试] 获得security_session_verify: {security_session_verify}")
-                    break
+                # 获取security_session_verify cookie
+                security_session_verify = None
+                for cookie in session.cookies:
+                    if cookie.name == 'security_session_verify':
+                        security_session_verify = cookie.value
+                        print(f"[调试] 获得security_session_verify: {security_session_verify}")
+                        break
             
-            if not security_session_verify:
-                print("[错误] 第一次请求未获得security_session_verify cookie")
-                continue
+                if not security_session_verify:
+                    print("[错误] 第一次请求未获得security_session_verify cookie")
+                    continue
             
-            time.sleep(1)
+                tracing.sleep(1)
             
-            # ========== 第二次请求 ==========
-            # 携带security_session_verify和srcurl，请求带屏幕分辨率参数的URL
-            second_url = f"{address}/FORUM/member.php?mod=logging&action=login&security_verify_data={security_verify_data}"
-            print(f"[调试] 第二次请求URL: {second_url}")
+                # ========== 第二次请求 ==========
+                # 携带security_session_verify和srcurl，请求带屏幕分辨率参数的URL
+                second_url = f"{address}/FORUM/member.php?mod=logging&action=login&security_verify_data={security_verify_data}"
+                print(f"[调试] 第二次请求URL: {second_url}")
             
-            # 设置srcurl cookie
-            session.cookies.set('srcurl', srcurl_value, path='/')
-            print(f"[调试] 设置srcurl cookie: {srcurl_value}")
+                # 设置srcurl cookie
+                session.cookies.set('srcurl', srcurl_value, path='/')
+                print(f"[调试] 设置srcurl cookie: {srcurl_value}")
             
-            # 打印当前携带的cookies
-            print("[调试] 第二次请求携带的cookies:")
-            for cookie in session.cookies:
-                print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
+                # 打印当前携带的cookies
+                print("[调试] 第二次请求携带的cookies:")
+                for cookie in session.cookies:
+                    print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
             
-            response = session.get(second_url)
-            print(f"[调试] 第二次请求状态: {response.status_code}")
+                response = session.get(second_url, fresh=True)
+                print(f"[调试] 第二次请求状态: {response.status_code}")
             
-            # 获取security_session_mid_verify cookie
-            # security_session_mid_verify = None
-            # for cookie in session.cookies:
-            #     if cookie.name == 'security_session_mid_verify':
-            #         security_session_mid_verify = cookie.value
-            #         print(f"[调试] 获得security_session_mid_verify: {security_session_mid_verify}")
-            #         break
+                # 获取security_session_mid_verify cookie
+                # security_session_mid_verify = None
+                # for cookie in session.cookies:
+                #     if cookie.name == 'security_session_mid_verify':
+                #         security_session_mid_verify = cookie.value
+                #         print(f"[调试] 获得security_session_mid_verify: {security_session_mid_verify}")
+                #         break
             
-            # if not security_session_mid_verify:
-            #     print("[错误] 第二次请求未获得security_session_mid_verify cookie")
-            #     continue
+                # if not security_session_mid_verify:
+                #     print("[错误] 第二次请求未获得security_session_mid_verify cookie")
+                #     continue
             
-            time.sleep(1)
+                tracing.sleep(1)
             
-            # ========== 第三次请求 ==========
-            # 携带security_session_verify, srcurl, security_session_mid_verify
-            third_url = f"{address}/FORUM/member.php?mod=logging&action=login"
-            print(f"[调试] 第三次请求URL: {third_url}")
+                # ========== 第三次请求 ==========
+                # 携带security_session_verify, srcurl, security_session_mid_verify
+                third_url = f"{address}/FORUM/member.php?mod=logging&action=login"
+                print(f"[调试] 第三次请求URL: {third_url}")
             
-            # 打印当前携带的cookies
-            print("[调试] 第三次请求携带的cookies:")
-            for cookie in session.cookies:
-                print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
+                # 打印当前携带的cookies
+                print("[调试] 第三次请求携带的cookies:")
+                for cookie in session.cookies:
+                    print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
             
-            response = session.get(third_url)
-            print(f"[调试] 第三次请求状态: {response.status_code}")
+                response = session.get(third_url, fresh=True)
+                print(f"[调试] 第三次请求状态: {response.status_code}")
             
-            # 检查是否获得论坛cookies
-            forum_cookies = {}
-            expected_forum_cookies = [
-                'sNgB_2132_saltkey',
-                'sNgB_2132_lastvisit',
-                'sNgB_2132_sid',
-                'sNgB_2132_lastact',
-                'sNgB_2132_lastrequest'
-            ]
+                # 检查是否获得论坛cookies
+                forum_cookies = {}
+                expected_forum_cookies = [
+                    'sNgB_2132_saltkey',
+                    'sNgB_2132_lastvisit',
+                    'sNgB_2132_sid',
+                    'sNgB_2132_lastact',
+                    'sNgB_2132_lastrequest'
+                ]
             
-            for cookie in session.cookies:
-                if cookie.name.startswith('sNgB_2132_'):
-                    forum_cookies[cookie.name] = cookie.value
-                    print(f"[调试] 获得论坛cookie: {cookie.name}: {cookie.value[:20]}...")
+                for cookie in session.cookies:
+                    if cookie.name.startswith('sNgB_2132_'):
+                        forum_cookies[cookie.name] = cookie.value
+                        print(f"[调试] 获得论坛cookie: {cookie.name}: {cookie.value[:20]}...")
             
-            if len(forum_cookies) < 3:
-                print(f"[警告] 第三次请求获得的论坛cookies数量不足: {len(forum_cookies)}")
-                # 继续尝试，不中断
+                if len(forum_cookies) < 3:
+                    print(f"[警告] 第三次请求获得的论坛cookies数量不足: {len(forum_cookies)}")
+                    # 继续尝试，不中断
             
-            time.sleep(1)
+                tracing.sleep(1)
             
-            # ========== 第四次请求 ==========
-            # 携带所有cookies，完成验证
-            fourth_url = f"{address}/FORUM/member.php?mod=logging&action=login"
-            print(f"[调试] 第四次请求URL: {fourth_url}")
+                # ========== 第四次请求 ==========
+                # 携带所有cookies，完成验证
+                fourth_url = f"{address}/FORUM/member.php?mod=logging&action=login"
+                print(f"[调试] 第四次请求URL: {fourth_url}")
             
-            # 打印当前携带的cookies
-            print("[调试] 第四次请求携带的cookies:")
-            for cookie in session.cookies:
-                print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
+                # 打印当前携带的cookies
+                print("[调试] 第四次请求携带的cookies:")
+                for cookie in session.cookies:
+                    print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
             
-            response = session.get(fourth_url)
-            print(f"[调试] 第四次请求状态: {response.status_code}")
+                response = session.get(fourth_url, fresh=True)
+                print(f"[调试] 第四次请求状态: {response.status_code}")
             
-            # 检查返回的cookies
-            print("[调试] 第四次请求后的所有cookies:")
-            for cookie in session.cookies:
-                print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
+                # 检查返回的cookies
+                print("[调试] 第四次请求后的所有cookies:")
+                for cookie in session.cookies:
+                    print(f"[调试]   {cookie.name}: {cookie.value[:30]}...")
             
-            # 检查是否获得sNgB_2132_invite_auth
-            invite_auth = None
-            for cookie in session.cookies:
-                if cookie.name == 'sNgB_2132_invite_auth':
-                    invite_auth = cookie.value
-                    print(f"[调试] 获得sNgB_2132_invite_auth: {invite_auth[:20]}...")
-                    break
+                # 检查是否获得sNgB_2132_invite_auth
+                invite_auth = None
+                for cookie in session.cookies:
+                    if cookie.name == 'sNgB_2132_invite_auth':
+                        invite_auth = cookie.value
+                        print(f"[调试] 获得sNgB_2132_invite_auth: {invite_auth[:20]}...")
+                        break
             
-            # 验证是否成功进入登录页面（检查是否还有验证码图片）
-            soup = BeautifulSoup(response.text, 'html.parser')
-            verify_img_check = soup.find('img', class_='verifyimg')
+                # 验证是否成功进入登录页面（检查是否还有验证码图片）
+                fields = extract_fields(response.text)
             
-            if verify_img_check:
-                print("[调试] 页面仍有验证码，验证可能失败")
-                # 输出响应体的前500字符用于调试
-                print(f"[调试] 响应体前500字符: {response.text[:500]}...")
-                continue  # 重试
-            else:
-                print("[调试] 验证成功，可以进行登录")
-                return True  # 验证成功，返回True
+                if fields.has_marker('img', 'verifyimg'):
+                    print("[调试] 页面仍有验证码，验证可能失败")
+                    # 输出响应体的前500字符用于调试
+                    print(f"[调试] 响应体前500字符: {response.text[:500]}...")
+                    continue  # 重试
+                else:
+                    print("[调试] 验证成功，可以进行登录")
+                    return True  # 验证成功，返回True
 
-        except Exception as e:
-            print(f"[错误] 验证过程中出现异常: {e}")
-            import traceback
-            traceback.print_exc()
-            if attempt < max_retries - 1:
-                time.sleep(2)
-                continue
-            else:
-                return False
+            except Exception as e:
+                print(f"[错误] 验证过程中出现异常: {e}")
+                import traceback
+                traceback.print_exc()
+                if attempt < max_retries - 1:
+                    tracing.sleep(2)
+                    continue
+                else:
+                    return False
     
     return False
 
@@ -335,18 +666,16 @@ def login(session):
     
     # 获取登录页面
     response = session.get(login_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    fields = extract_fields(response.text)
     
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
-    formhash = formhash_input.get('value') if formhash_input else ''
+    formhash = fields.input_value('formhash') or ''
     
     # 提取loginhash - 从登录表单的action属性中提取
     # 表单action格式: member.php?mod=logging&action=login&loginsubmit=yes&loginhash=LQ9Xl
     loginhash = ''
-    login_form = soup.find('form', {'name': 'login'})
-    if login_form:
-        action = login_form.get('action', '')
+    action = fields.form_action('login')
+    if action:
         # 从action URL中提取loginhash参数
         loginhash_match = re.search(r'loginhash=([^&]+)', action)
         if loginhash_match:
@@ -425,6 +754,7 @@ def signin(session):
     response = session.get(url)
     
     # 检查是否有徽章弹窗
+    badge_claimed = False
     try:
         if 'fwin_badgewin_7ree' in response.text:
             print("徽章弹窗出现，准备领取徽章。")
@@ -433,19 +763,20 @@ def signin(session):
             badge_response = session.get(badge_url)
             
             # 模拟点击领取按钮
-            soup = BeautifulSoup(badge_response.text, 'html.parser')
-            badge_link = soup.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
+            document = parse_html(badge_response.text)
+            badge_link = document.find('a', href=re.compile(r'plugin\.php\?id=badge_7ree'))
             if badge_link:
                 badge_href = badge_link.get('href')
                 if not badge_href.startswith('http'):
                     badge_href = f"{address}/forum/" + badge_href
                 session.get(badge_href)
+                badge_claimed = True
                 print("徽章领取成功！")
     except Exception:
         print("没有徽章弹窗。")
     
-    # 重新导航到签到页面
-    response = session.get(url)
+    # 重新导航到签到页面（领取徽章后页面已变化，需要重新请求）
+    response = session.get(url, fresh=badge_claimed)
     
     # 开始签到流程
     if '您今天已经签到过了或者签到时间还未开始' in response.text:
@@ -454,11 +785,10 @@ def signin(session):
     
     try:
         # 获取页面表单数据
-        soup = BeautifulSoup(response.text, 'html.parser')
+        fields = extract_fields(response.text)
         
         # 提取formhash
-        formhash_input = soup.find('input', {'name': 'formhash'})
-        formhash = formhash_input.get('value') if formhash_input else ''
+        formhash = fields.input_value('formhash') or ''
         
         # 构建签到数据
         signin_data = {
@@ -492,76 +822,69 @@ def question(session):
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop&infloat=yes&handlekey=pop&inajax=1&ajaxtarget=fwin_content_pop"
 
     try:
-        response = session.get(base_url)
-
-        time.sleep(1)
-
-        # 检查是否已完成答题
-        if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
-            add_log("今日答题已完成。")
-            return
+        # 每道题只请求一次题目页面：同一个响应既用来判断是否已完成，也用来解析题目、formhash和选项，
+        # 提交答案后再请求下一题
+        response = session.get(base_url, fresh=True)
 
         # 开始答题流程
         question_count = 0
         max_questions = 3  # 设置最大答题数量防止无限循环
         
         while question_count < max_questions:
-            response = session.get(base_url)
-            time.sleep(1)
-            
             # 检查是否还有题目
             if '今日答题已完成' in response.text or '您今天已经答过题了' in response.text:
                 add_log("今日答题已完成。")
                 break
                 
             try:
-                answer_question(session, question_count)
+                with tracing.span("answer_question", number=question_count + 1):
+                    answer_question(session, question_count, response)
                 question_count += 1
             except Exception as e:
                 print(f"答题第{question_count + 1}题过程中出现错误: {e}")
                 save_response_on_failure(response, f"question_{question_count}")
-                time.sleep(5)
-                continue
+                tracing.sleep(5)
+            
+            response = session.get(base_url, fresh=True)
                 
     except Exception as e:
         print(f"答题过程中出现错误: {e}")
         add_log("答题失败。")
 
-def answer_question(session, question_number):
+def answer_question(session, question_number, response):
+    """回答question()已获取的题目页面中的题目"""
     base_url = f"{address}/forum/plugin.php?id=ahome_dayquestion:pop"
-    response = session.get(base_url)
-    print(response)
+    # 每道题的总时间预算，超出后直接使用默认答案
+    deadline = time.time() + answer_budget
 
-    question_text, options_dict = parse_question(response.text)
+    question_text, options_dict, radio_values = parse_question(response.text)
     print("===============")
     print(f"题目: {question_text}")
     
-    # 调用API获取答案
-    prompt = build_prompt(response.text)
-    print(prompt)
-    label = get_answer_from_api(prompt)
-    if not label or label.strip() == '':
-        print("API 未返回结果，默认选择 a2")
-        label = 'a2'
-    if label not in ['a1', 'a2', 'a3', 'a4']:
-        print("API 返回结果不在合法选项中，默认选择 a2")
-        label = 'a2'
+    # 按策略顺序作答，所有策略都没有答案时使用默认答案
+    context = {"question": question_text, "options": options_dict, "html": response.text, "deadline": deadline}
+    label, strategy, confidence = answer_router.route(context) if answer_router else (None, None, 0.0)
+    if label:
+        print(f"答题策略 {strategy} 作答: {label}（置信度 {confidence:.2f}）")
+    else:
+        candidates = get_candidates(context)
+        label = 'a2' if 'a2' in candidates else candidates[0]
+        print(f"所有答题策略都没有给出答案，默认选择 {label}")
 
     # 构建答题数据
-    soup = BeautifulSoup(response.text, 'html.parser')
+    fields = extract_fields(response.text)
     answer_data = {}
 
     # 提取formhash
-    formhash_input = soup.find('input', {'name': 'formhash'})
-    if formhash_input:
-        answer_data['formhash'] = formhash_input.get('value', '')
-
-    # 找到对应的radio button并获取其value
-    radio_input = soup.find('input', {'id': label, 'type': 'radio'})
-    if radio_input:
-        answer_data['answer'] = radio_input.get('value', '2')
-    else:
-        answer_data['answer'] = '2'
+    formhash = fields.input_value('formhash')
+    if formhash is not None:
+        answer_data['formhash'] = formhash
+
+    # 找到对应的radio button并获取其value（解析题目时已取出）
+    radio_value = radio_values.get(label)
+    if radio_value is None:
+        radio_value = fields.radio_value(label)
+    answer_data['answer'] = radio_value if radio_value is not None else '2'
 
     answer_data['submit'] = 'true'
 
@@ -575,128 +898,355 @@ def answer_question(session, question_number):
         money = money_match.group(1) if money_match else '0'
         question_stats["correct"] += 1
         add_log(f"第{question_number + 1}题回答正确，获得{money}金钱")
+        if answer_store:
+            answer_store.record(question_text, options_dict, label, True)
+        if answer_router:
+            answer_router.record_outcome(True)
+        record_ensemble_votes(label, True)
     elif '回答错误！扣除' in submit_response.text:
         money_match = re.search(r'扣除(\d+)金钱', submit_response.text)
         money = money_match.group(1) if money_match else '0'
         question_stats["wrong"] += 1
         add_log(f"第{question_number + 1}题回答错误，扣除{money}金钱")
-        # 保存错题到wrong.json
-        save_wrong_question(question_text, label, options_dict)
+        if answer_store:
+            answer_store.record(question_text, options_dict, label, False)
+        if answer_router:
+            answer_router.record_outcome(False)
+        record_ensemble_votes(label, False)
     else:
         add_log(f"第{question_number + 1}题答题完成，结果未知")
+        if answer_router:
+            answer_router.record_outcome(None)
+        record_ensemble_votes(label, None)
 
-def save_wrong_question(question_text, answer_id, options_dict):
-    """将错题保存到wrong.json文件"""
-    if not question_text or not answer_id:
-        return
-    
-    wrong_file = 'wrong.json'
-    wrong_data = []
-    
-    try:
-        # 读取现有的错题数据
-        if os.path.exists(wrong_file):
-            with open(wrong_file, 'r', encoding='utf-8') as f:
-                wrong_data = json.load(f)
-        
-        # 构建错题记录
-        wrong_entry = {
-            "question": question_text,
-            "wrong_answer": answer_id,
-            "wrong_answer_text": options_dict.get(answer_id, ''),
-            "options": options_dict,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # 检查是否已存在相同题目
-        existing_index = None
-        for i, entry in enumerate(wrong_data):
-            if entry.get("question") == question_text:
-                existing_index = i
-                break
-        
-        if existing_index is not None:
-            # 更新已存在的记录
-            wrong_data[existing_index] = wrong_entry
-            print(f"更新错题记录: {question_text[:30]}...")
-        else:
-            # 添加新记录
-            wrong_data.append(wrong_entry)
-            print(f"添加新错题记录: {question_text[:30]}...")
-        
-        # 写回文件
-        with open(wrong_file, 'w', encoding='utf-8') as f:
-            json.dump(wrong_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"错题已保存到 {wrong_file}")
-        
-    except Exception as e:
-        print(f"保存错题失败: {e}")
+def get_candidates(context):
+    """排除答案缓存中已知错误的选项后剩下的候选，全部错误时（记录有误）不排除"""
+    if "candidates" not in context:
+        if "known_wrong" not in context:
+            entry = answer_store.get(context["question"], context["options"], fuzzy=False) if answer_store else None
+            context["known_wrong"] = entry["wrong"] if entry else []
+        candidates = [aid for aid in ['a1', 'a2', 'a3', 'a4'] if aid not in context["known_wrong"]]
+        if not candidates:
+            context["known_wrong"] = []
+            candidates = ['a1', 'a2', 'a3', 'a4']
+        context["candidates"] = candidates
+    return context["candidates"]
 
-def parse_question(html):
-    """解析题目和选项，返回题目文本和选项字典"""
-    # 提取题目
-    question_match = re.search(r'【题目】</b>&nbsp;([^<]+)', html)
-    question_text = question_match.group(1) if question_match else ""
-    
-    # 提取选项
-    options_dict = {}
-    radio_pattern = r'id="(a\d)"[^>]*>&nbsp;&nbsp;([^<]+)'
-    matches = re.findall(radio_pattern, html, re.DOTALL)
-    
-    for option_id, option_text in matches:
-        options_dict[option_id] = option_text.strip()
-    
-    # 备用方案
-    if len(options_dict) < 4:
-        for i in range(1, 5):
-            aid = f"a{i}"
-            if aid not in options_dict:
-                pattern = rf'id="{aid}"[^>]*>.*?([^<]+)</div>'
-                match = re.search(pattern, html, re.DOTALL)
-                if match:
-                    options_dict[aid] = match.group(1).replace('&nbsp;', ' ').strip()
-    
-    return question_text, options_dict
+def strategy_exact(context):
+    """答案缓存：题目和选项精确匹配的确认正确答案"""
+    if not answer_store:
+        return None, 0.0
+    label = answer_store.lookup(context["question"], context["options"], fuzzy=False)
+    entry = answer_store.last_entry
+    context["known_wrong"] = entry["wrong"] if entry else []
+    return label, 1.0
+
+def strategy_fuzzy(context):
+    """答案缓存：近似题目的确认正确答案，置信度为题目相似度"""
+    if not answer_store:
+        return None, 0.0
+    label, score = answer_store.lookup_fuzzy(context["question"], context["options"])
+    if label not in get_candidates(context):
+        return None, 0.0
+    return label, score
 
-def build_prompt(html):
-    question_text, options_dict = parse_question(html)
+def strategy_elimination(context):
+    """排除法：排除已知错误选项后只剩一个时直接作答"""
+    candidates = get_candidates(context)
+    if len(candidates) != 1:
+        return None, 0.0
+    elimination_stats["saved"] += 1
+    print(f"排除已知错误选项 {context['known_wrong']} 后只剩 {candidates[0]}，无需调用API")
+    return candidates[0], 1.0
+
+def strategy_warm(context):
+    """预答：预热任务（warm_cache.py）提前让大模型答好的答案，置信度由路由按历史准确率修正"""
+    if not answer_store:
+        return None, 0.0
+    label = answer_store.get_suggestion(context["question"], context["options"])
+    if label not in get_candidates(context):
+        return None, 0.0
+    return label, 1.0
+
+def build_local_ranker_async():
+    """在后台线程中建立本地排序器（题库很大时需要几十秒），建立完成前排序策略直接跳过"""
+    global local_ranker_thread
+
+    def worker():
+        global local_ranker
+        try:
+            local_ranker = LocalRanker.from_db(answer_db)
+        except Exception as e:
+            print(f"[警告] 后台建立本地排序器失败: {e}")
+
+    if local_ranker is None and local_ranker_thread is None:
+        local_ranker_thread = threading.Thread(target=worker, daemon=True)
+        local_ranker_thread.start()
+
+def strategy_ranker(context):
+    """本地排序器：根据历史题库给候选选项打分"""
+    if not answer_store:
+        return None, 0.0
+    if local_ranker is None:
+        build_local_ranker_async()
+        print("[调试] 本地排序器尚未建立完成，跳过")
+        return None, 0.0
+    return local_ranker.best(context["question"], context["options"], get_candidates(context))
+
+def strategy_llm(context):
+    """大模型：只把候选选项发给大模型，置信度由路由按历史准确率修正"""
+    candidates = get_candidates(context)
+    if context["known_wrong"]:
+        elimination_stats["narrowed"] += 1
+        print(f"排除已知错误选项: {context['known_wrong']}")
+    prompt = build_prompt(context["html"], exclude=context["known_wrong"])
+    print(prompt)
+    label = get_answer_from_api(prompt, context["deadline"])
+    if label not in candidates:
+        if label:
+            print(f"API 返回结果 {label} 不在候选选项中")
+        return None, 0.0
+    return label, 1.0
+
+ANSWER_STRATEGIES = {
+    'exact': strategy_exact,
+    'fuzzy': strategy_fuzzy,
+    'elimination': strategy_elimination,
+    'warm': strategy_warm,
+    'ranker': strategy_ranker,
+    'llm': strategy_llm,
+}
+
+def build_prompt(html, exclude=()):
+    """构建提示词，exclude中的选项（已知错误）不发给大模型"""
+    question_text, options_dict, _ = parse_question(html)
     
     if not question_text.strip():
         return ""
     
-    options = [f"{k}: {v}" for k, v in sorted(options_dict.items())]
-    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + "\n请选择正确答案，只返回选项ID（如a1、a2、a3、a4）："
+    options = [f"{k}: {v}" for k, v in sorted(options_dict.items()) if k not in exclude]
+    option_ids = "、".join(k for k in ['a1', 'a2', 'a3', 'a4'] if k not in exclude)
+    prompt = f"题目: {question_text}\n选项:\n" + "\n".join(options) + f"\n请选择正确答案，只返回选项ID（如{option_ids}）："
     
     return prompt
 
-def get_answer_from_api(prompt):
-    import time
-    
+def call_api_streaming(prompt, app=None, cancel=None):
+    """流式调用大模型，一出现完整的选项标签就关闭流，返回(标签, 首字耗时, 出标签耗时)"""
+    start_time = time.time()
+    first_token = None
+    text = ''
+    responses = Application.call(
+        api_key=api_key,
+        app_id=app or app_id,
+        prompt=prompt,
+        stream=True,
+        incremental_output=True)
     try:
+        for response in responses:
+            # 投票已结束，不再接收
+            if cancel is not None and cancel.is_set():
+                return None, first_token, time.time() - start_time
+            if response.status_code != 200:
+                raise Exception(f"{response.code}: {response.message}")
+            chunk = response.output.text or ''
+            if chunk and first_token is None:
+                first_token = time.time() - start_time
+            text += chunk
+            # 标签后面已经出现了其他字符，说明标签是完整的（不会是a12之类的前缀）
+            match = LABEL_RE.search(text)
+            if match and match.end() < len(text):
+                return match.group(0), first_token, time.time() - start_time
+        match = LABEL_RE.search(text)
+        return (match.group(0) if match else None), first_token, time.time() - start_time
+    finally:
+        if hasattr(responses, 'close'):
+            responses.close()
+
+def start_api_call(prompt, results, index, app=None, cancel=None):
+    """在后台线程中调用大模型（默认APP_ID），结果(序号, 标签, 耗时, 异常, 流式耗时)放入results队列"""
+    def worker():
         start_time = time.time()
-        response = Application.call(
-            api_key=api_key,
-            app_id=app_id,
-            prompt=prompt)
+        try:
+            if api_stream:
+                label, first_token, label_time = call_api_streaming(prompt, app, cancel)
+                timing = {"ttft": first_token, "ttl": label_time}
+            else:
+                response = Application.call(
+                    api_key=api_key,
+                    app_id=app or app_id,
+                    prompt=prompt)
+                label = None
+                if response:
+                    match = LABEL_RE.search(response.output.text or '')
+                    label = match.group(0) if match else None
+                timing = {}
+            results.put((index, label, time.time() - start_time, None, timing))
+        except Exception as e:
+            results.put((index, None, time.time() - start_time, e, {}))
+
+    # 守护线程：卡住的调用不会阻塞脚本退出
+    threading.Thread(target=worker, daemon=True).start()
+
+def get_hedge_delay():
+    """对冲阈值：最近HEDGE_WINDOW次（含历史运行）单次调用耗时的指定分位数，样本不足时使用默认值"""
+    latencies = api_latencies[-HEDGE_WINDOW:]
+    if len(latencies) < 3:
+        return hedge_default_delay
+    return percentile(latencies, hedge_percentile)
+
+@tracing.traced()
+def get_answer_from_api(prompt, deadline=None):
+    start_time = time.time()
+    timeout = api_timeout
+    if deadline is not None:
+        timeout = min(timeout, deadline - start_time)
+    if timeout <= 0:
+        print("答题时间预算已用完，不再调用API")
+        api_calls.append({"latency": 0, "outcome": "timeout", "hedged": False})
+        return None
+    if ensemble_apps:
+        return get_answer_from_ensemble(prompt, timeout)
+    
+    results = queue.Queue()
+    start_api_call(prompt, results, 0)
+    calls = 1
+    finished = 0
+    hedge_delay = get_hedge_delay() if hedge_enabled else None
+    label = None
+    outcome = "timeout"
+    timing = {}
+    
+    while True:
+        elapsed = time.time() - start_time
+        remaining = timeout - elapsed
+        if remaining <= 0:
+            break
+        wait = remaining
+        if hedge_delay is not None and calls == 1:
+            wait = min(wait, max(0, hedge_delay - elapsed))
+        try:
+            index, result_label, latency, error, result_timing = results.get(timeout=wait)
+        except queue.Empty:
+            if hedge_delay is not None and calls == 1 and time.time() - start_time >= hedge_delay:
+                print(f"[调试] API调用超过 {hedge_delay:.1f} 秒未返回，发起对冲调用")
+                start_api_call(prompt, results, 1)
+                calls = 2
+            continue
         
+        finished += 1
+        if error is None:
+            api_latencies.append(latency)
+            if answer_store:
+                answer_store.record_latency(app_id, latency)
+        else:
+            print(f"API调用异常: {error}")
+        if result_label:
+            label = result_label
+            timing = result_timing
+            outcome = "hedge" if index == 1 else "ok"
+            break
+        # 所有已发起的调用都失败了就不再等待
+        if finished >= calls:
+            outcome = "error"
+            break
+    
+    elapsed = time.time() - start_time
+    record = {"latency": round(elapsed, 3), "outcome": outcome, "hedged": calls > 1}
+    for key, value in timing.items():
+        if value is not None:
+            record[key] = round(value, 3)
+    api_calls.append(record)
+    print(f"[调试] API调用耗时 {elapsed:.2f} 秒，结果: {outcome}，对冲: {'是' if calls > 1 else '否'}")
+    if timing.get("ttft") is not None:
+        print(f"[调试] 流式首字耗时 {timing['ttft']:.2f} 秒，出标签耗时 {timing['ttl']:.2f} 秒")
+    
+    if outcome == "timeout":
+        print(f"API调用超时({timeout:.0f}秒)")
+        return None
+    if not label:
+        print("API 未返回有效答案")
+        return None
+    print(f"API 返回的答案标签: {label}")
+    return label
+
+@tracing.traced()
+def get_answer_from_ensemble(prompt, timeout):
+    """同一提示词同时发给多个应用，在timeout内按历史准确率加权投票，返回得票最多的标签"""
+    global ensemble_votes
+    start_time = time.time()
+    apps = [app_id] + [app for app in ensemble_apps if app != app_id]
+    weights = answer_store.model_weights(apps) if answer_store else {app: 1.0 for app in apps}
+    results = queue.Queue()
+    cancel = threading.Event()
+    for index, app in enumerate(apps):
+        start_api_call(prompt, results, index, app, cancel)
+    
+    pending = set(range(len(apps)))
+    tally = {}
+    ensemble_votes = []
+    first_vote = None
+    while pending:
         elapsed = time.time() - start_time
-        if elapsed > 120:
-            print("API调用超时(2分钟)，默认选择 a2")
-            return 'a2'
-            
-        if response:
-            label = response.output.text
-            match = re.search(r'\ba[1-4]\b', label)
-            label = match.group(0) if match else None
-            print(f"API 返回的答案标签: {label}")
-            return label if label else 'a2'
-            
-    except Exception as e:
-        print(f"API调用异常: {e}，默认选择 a2")
-        return 'a2'
+        remaining = timeout - elapsed
+        if first_vote is not None:
+            remaining = min(remaining, first_vote + ensemble_grace - elapsed)
+        if remaining <= 0:
+            break
+        try:
+            index, label, latency, error, _ = results.get(timeout=remaining)
+        except queue.Empty:
+            break
+        pending.discard(index)
+        app = apps[index]
+        if error is not None:
+            print(f"应用 {app} 调用异常: {error}")
+            continue
+        api_latencies.append(latency)
+        print(f"[调试] 应用 {app} 投票: {label}，权重 {weights[app]:.2f}，耗时 {latency:.2f} 秒")
+        if not label:
+            continue
+        ensemble_votes.append((app, label, latency))
+        tally[label] = tally.get(label, 0) + weights[app]
+        if first_vote is None:
+            first_vote = time.time() - start_time
+        # 还没返回的应用全部投给第二名也追不上时提前结束
+        ranked = sorted(tally.values(), reverse=True)
+        runner_up = ranked[1] if len(ranked) > 1 else 0
+        if ranked[0] > runner_up + sum(weights[apps[i]] for i in pending):
+            break
+    # 取消还没返回的调用（流式调用会关闭连接，非流式调用的结果直接丢弃）
+    cancel.set()
     
-    return 'a2'
+    elapsed = time.time() - start_time
+    outcome = "ok" if tally else ("timeout" if pending else "error")
+    api_calls.append({"latency": round(elapsed, 3), "outcome": outcome, "hedged": False,
+                      "votes": len(ensemble_votes), "models": len(apps)})
+    if not tally:
+        print(f"多模型投票没有得到有效答案，耗时 {elapsed:.2f} 秒")
+        return None
+    label = max(tally, key=tally.get)
+    print(f"[调试] 多模型投票 {tally}，耗时 {elapsed:.2f} 秒，{len(pending)} 个应用未返回")
+    print(f"API 返回的答案标签: {label}")
+    return label
+
+def record_ensemble_votes(label, is_correct):
+    """根据答题结果记录各应用投票的对错：投给提交答案的票与结果一致，
+    答对时其他票都是错的，答错时其他票无法判断"""
+    global ensemble_votes
+    for app, vote, latency in ensemble_votes:
+        if vote == label:
+            correct = is_correct
+        else:
+            correct = False if is_correct else None
+        stats = ensemble_stats.setdefault(app, {"votes": 0, "correct": 0, "judged": 0, "latency": 0.0})
+        stats["votes"] += 1
+        stats["latency"] += latency
+        if correct is not None:
+            stats["judged"] += 1
+            stats["correct"] += 1 if correct else 0
+        if answer_store:
+            answer_store.record_vote(app, vote, latency, correct)
+    ensemble_votes = []
 
 def check_free_lottery(session):
     # 获取抽奖页面
@@ -715,10 +1265,8 @@ def lottery(session):
         # 获取抽奖页面的formhash
         url = f"{address}/forum/plugin.php?id=gplayconstellation:front"
         response = session.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        formhash_input = soup.find('input', {'name': 'formhash'})
-        formhash = formhash_input.get('value') if formhash_input else ''
+        fields = extract_fields(response.text)
+        formhash = fields.input_value('formhash') or ''
         
         # 第一步：获取抽奖结果
         game_result_url = f"{address}/forum/plugin.php?id=gplayconstellation:front&mod=index&formhash={formhash}&act=game_result&inajax=1&ajaxtarget=myaward"
@@ -740,24 +1288,45 @@ def lottery(session):
         print(f"抽奖过程中出现错误: {e}")
         add_log("抽奖失败。")
     
-def getMoney(session):
+def parse_money(html):
+    """从积分页面中解析金钱数，未找到时返回None"""
+    # 首先找到creditl类的内容
+    creditl_match = re.search(r'<ul class="creditl[^"]*"[^>]*>(.*?)</ul>', html, re.DOTALL)
+    if creditl_match:
+        creditl_content = creditl_match.group(1)
+        # 在creditl内容中查找金钱数字
+        money_match = re.search(r'金钱:\s*</em>(\d+)', creditl_content)
+        if money_match:
+            return int(money_match.group(1))
+    return None
+
+def getMoney(session, fresh=False):
     try:
         url = f"{address}/forum/home.php?mod=spacecp&ac=credit&showcredit=1"
-        response = session.get(url)
-        
-        # 首先找到creditl类的内容
-        creditl_match = re.search(r'<ul class="creditl[^"]*"[^>]*>(.*?)</ul>', response.text, re.DOTALL)
-        if creditl_match:
-            creditl_content = creditl_match.group(1)
-            # 在creditl内容中查找金钱数字
-            money_match = re.search(r'金钱:\s*</em>(\d+)', creditl_content)
-            if money_match:
-                return int(money_match.group(1))
+        response = session.get(url, fresh=fresh)
         
-        return 0
+        money = parse_money(response.text)
+        return money if money is not None else 0
     except Exception as e:
         print(f"获取金钱信息失败: {e}")
         return 0
+
+def check_session_alive(session):
+    """用一次积分页面请求校验已保存的cookies是否仍处于登录状态"""
+    try:
+        url = f"{address}/forum/home.php?mod=spacecp&ac=credit&showcredit=1"
+        response = session.get(url)
+        print(f"[调试] cookies校验请求状态: {response.status_code}")
+        
+        # 未登录时积分页面会跳转到登录提示，找不到金钱信息
+        money = parse_money(response.text)
+        if money is None:
+            return False
+        print(f"[调试] 已保存的cookies有效，当前金钱: {money}")
+        return True
+    except Exception as e:
+        print(f"[调试] 校验cookies失败: {e}")
+        return False
     
 def sendPushplus(msg):
     try:
@@ -795,11 +1364,30 @@ def sendPushplus(msg):
     except Exception as e:
         print(f"推送消息发送失败: {e}")
      
-def merge(local: bool):
+def merge(local: bool, reuse_cookies: bool = False):
     global username, password, pushplus_token
 
+    # 打开答案缓存
+    global answer_store
+    answer_store = AnswerStore(answer_db, fuzzy_threshold=fuzzy_threshold)
+    # 模糊匹配索引在后台提前建立（登录、签到期间），不占用答题时间
+    if 'fuzzy' in answer_strategies:
+        answer_store.build_index_async()
+    if 'ranker' in answer_strategies:
+        build_local_ranker_async()
+    # 每天只运行一次，单次运行中的调用不足以估计分位数，对冲阈值使用历史运行的耗时
+    if hedge_enabled:
+        api_latencies[:0] = reversed(answer_store.recent_latencies(app_id, HEDGE_WINDOW))
+        print(f"[调试] 载入 {len(api_latencies)} 次历史API耗时，对冲阈值 {get_hedge_delay():.1f} 秒")
+    global answer_router
+    answer_router = AnswerRouter(ANSWER_STRATEGIES, answer_strategies, route_confidence,
+                                 auto_order=route_auto_order, conn=answer_store.conn)
+    print(f"[调试] 答题策略顺序: {', '.join(answer_router.effective_order())}")
+    
     # 创建会话
-    req_session = RequestsSession()
+    req_session = RequestsSession(reuse_cookies=reuse_cookies, event_log=request_log or None)
+    global current_session
+    current_session = req_session
     
     # 打印初始cookies信息
     req_session.print_cookies()
@@ -812,33 +1400,47 @@ def merge(local: bool):
     else:
         print(f"=== Script for {username} started at {now_str} remotely===")
 
-    # 先进行验证码验证
-    verify_success = False
-    for verify_round in range(3):
-        verify_success = verify(req_session.session)
-        if verify_success:
-            print("[调试] 验证码验证成功，开始登录")
-            break
-        else:
-            if verify_round < 2:
-                print("重新尝试验证...")
-                time.sleep(5)
-    
-    # 验证成功后进行登录
+    # 复用模式下先校验已保存的cookies，有效则跳过验证和登录
     login_success = False
-    max_login_retries = 3
-    for attempt in range(max_login_retries):
-        login_success = login(req_session.session)
-        if login_success:
-            # 登录成功后保存cookies
-            req_session.save_cookies()
-            req_session.print_cookies()
-            req_session.check_forum_cookies()
-            break
-        else:
-            print(f"登录失败，尝试 {attempt + 1}/{max_login_retries}")
-            if attempt < max_login_retries - 1:
-                time.sleep(2)
+    if req_session.reuse_cookies:
+        with req_session.step("check"):
+            if req_session.cookies_loaded and check_session_alive(req_session.session):
+                add_log("cookies缓存命中，跳过验证和登录")
+                login_success = True
+            else:
+                add_log("cookies缓存未命中，重新验证和登录")
+    
+    if not login_success:
+        # 先进行验证码验证
+        with req_session.step("verify"):
+            verify_success = False
+            for verify_round in range(3):
+                with tracing.span("verify_round", round=verify_round + 1):
+                    verify_success = verify(req_session.session)
+                if verify_success:
+                    print("[调试] 验证码验证成功，开始登录")
+                    break
+                else:
+                    if verify_round < 2:
+                        print("重新尝试验证...")
+                        tracing.sleep(5)
+        
+        # 验证成功后进行登录
+        with req_session.step("login"):
+            max_login_retries = 3
+            for attempt in range(max_login_retries):
+                with tracing.span("login_attempt", attempt=attempt + 1):
+                    login_success = login(req_session.session)
+                if login_success:
+                    # 登录成功后保存cookies
+                    req_session.save_cookies()
+                    req_session.print_cookies()
+                    req_session.check_forum_cookies()
+                    break
+                else:
+                    print(f"登录失败，尝试 {attempt + 1}/{max_login_retries}")
+                    if attempt < max_login_retries - 1:
+                        tracing.sleep(2)
     
     if not login_success:
         print("登录失败，程序退出")
@@ -848,36 +1450,144 @@ def merge(local: bool):
     # 登录成功后随机等待
     random_wait()
     global money_stats
-    initial_money = getMoney(req_session.session)
+    with req_session.step("getMoney"):
+        initial_money = getMoney(req_session.session)
     money_stats["initial"] = initial_money
     
     # 签到前随机等待
     random_wait()
-    signin(req_session.session)
+    with req_session.step("signin"):
+        signin(req_session.session)
     
     # 答题前随机等待
     random_wait()
-    question(req_session.session)
+    with req_session.step("question"):
+        question(req_session.session)
+    if answer_store.lookups:
+        add_log(answer_store.summary())
+    if elimination_stats["saved"] or elimination_stats["narrowed"]:
+        add_log(f"排除法节省API调用{elimination_stats['saved']}次，缩小候选{elimination_stats['narrowed']}次。")
+    if any(answer_router.wins.values()):
+        add_log(answer_router.summary())
+    for app, stats in ensemble_stats.items():
+        accuracy = f"{stats['correct']}/{stats['judged']}" if stats["judged"] else "未知"
+        add_log(f"应用{app[-6:]}投票{stats['votes']}次，答对{accuracy}，平均耗时{stats['latency'] / stats['votes']:.1f}秒。")
+    if api_calls:
+        timeouts = sum(1 for call in api_calls if call["outcome"] == "timeout")
+        hedged = sum(1 for call in api_calls if call["hedged"])
+        avg_latency = sum(call["latency"] for call in api_calls) / len(api_calls)
+        add_log(f"API调用{len(api_calls)}次，平均耗时{avg_latency:.1f}秒，超时{timeouts}次，对冲{hedged}次。")
     
     # 抽奖前随机等待
     random_wait()
-    lottery(req_session.session)
+    with req_session.step("lottery"):
+        lottery(req_session.session)
     
     # 最后获取金钱前随机等待
     random_wait()
-    final_money = getMoney(req_session.session)
+    # 抽奖等操作会改变金钱，必须重新请求
+    with req_session.step("getMoney"):
+        final_money = getMoney(req_session.session, fresh=True)
     money_stats["final"] = final_money
     add_log(f"金钱变化：{initial_money} -> {final_money}。")
+    add_log(f"页面缓存命中{req_session.session.cache_hits}次，未命中{req_session.session.cache_misses}次，"
+            f"节省{req_session.session.cache_hits}次请求。")
+    
+    if req_session.session.transfer_stats:
+        add_log(req_session.session.transfer_summary())
+    if req_session.events:
+        add_log(req_session.session.event_summary())
     
     # 任务完成后再次保存cookies
     req_session.save_cookies()
+    answer_store.close()
 
 def main():
     global username, password, pushplus_token, api_key, app_id, address
+    global api_timeout, answer_budget, hedge_enabled, hedge_percentile, api_stream, answer_db
+    global fuzzy_threshold, answer_strategies, route_confidence, route_auto_order
+    global ensemble_apps, ensemble_grace, request_log, trace_file, profile_enabled, profile_top, history_db
+    global metrics_file, metrics_format
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--local', action='store_true', help='Use local config')
+    parser.add_argument('--parser', choices=['selectolax', 'lxml', 'html.parser'],
+                        help='Force HTML parser backend (or set PAGE_PARSER)')
+    parser.add_argument('--reuse-cookies', action='store_true',
+                        help='Reuse saved cookies when they are still valid (or set REUSE_COOKIES=1)')
+    parser.add_argument('--api-timeout', type=float, default=float(os.environ.get('API_TIMEOUT', api_timeout)),
+                        help='Hard deadline in seconds for one LLM call (or set API_TIMEOUT)')
+    parser.add_argument('--answer-budget', type=float, default=float(os.environ.get('ANSWER_BUDGET', answer_budget)),
+                        help='Time budget in seconds for answering one question (or set ANSWER_BUDGET)')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Fire a second LLM call when the first is slower than --hedge-percentile (or set API_HEDGE=1)')
+    parser.add_argument('--hedge-percentile', type=float, default=float(os.environ.get('API_HEDGE_PERCENTILE', hedge_percentile)),
+                        help='Latency percentile of earlier calls (persisted in --answer-db) that triggers the hedged call')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream LLM output and stop at the first complete a1-a4 label (or set API_STREAM=1)')
+    parser.add_argument('--answer-db', default=os.environ.get('ANSWER_DB', answer_db),
+                        help='SQLite answer cache path (or set ANSWER_DB)')
+    parser.add_argument('--fuzzy-threshold', type=float, default=float(os.environ.get('FUZZY_THRESHOLD', fuzzy_threshold)),
+                        help='Similarity threshold for near-duplicate question lookup, 0 disables (or set FUZZY_THRESHOLD)')
+    parser.add_argument('--strategies', default=os.environ.get('ANSWER_STRATEGIES', ','.join(answer_strategies)),
+                        help='Comma-separated answer strategy order, from: ' + ','.join(ANSWER_STRATEGIES)
+                             + ' (or set ANSWER_STRATEGIES)')
+    parser.add_argument('--route-confidence', type=float, default=float(os.environ.get('ROUTE_CONFIDENCE', route_confidence)),
+                        help='Stop at the first strategy whose answer reaches this confidence (or set ROUTE_CONFIDENCE)')
+    parser.add_argument('--no-auto-order', action='store_true',
+                        help='Keep the configured strategy order instead of reordering by latency/accuracy '
+                             '(or set ROUTE_AUTO_ORDER=0)')
+    parser.add_argument('--ensemble-apps', default=os.environ.get('ENSEMBLE_APPS', ''),
+                        help='Comma-separated extra DashScope app ids to vote together with APP_ID (or set ENSEMBLE_APPS)')
+    parser.add_argument('--ensemble-grace', type=float, default=float(os.environ.get('ENSEMBLE_GRACE', ensemble_grace)),
+                        help='Seconds to wait for more votes after the first one arrives (or set ENSEMBLE_GRACE)')
+    parser.add_argument('--request-log', default=os.environ.get('REQUEST_LOG', request_log),
+                        help='Append one JSON line per HTTP request (step, timings, bytes) to this file, '
+                             'e.g. request_events.jsonl; off by default (or set REQUEST_LOG)')
+    parser.add_argument('--trace', default=os.environ.get('TRACE_FILE', trace_file),
+                        help='Write a Chrome trace-event JSON of the run to this file plus folded stacks '
+                             'next to it (or set TRACE_FILE)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Run under cProfile and tracemalloc and write pstats plus a top-N report '
+                             '(or set PROFILE=1)')
+    parser.add_argument('--profile-top', type=int, default=int(os.environ.get('PROFILE_TOP', profile_top)),
+                        help='Rows in each profile report table (or set PROFILE_TOP)')
+    parser.add_argument('--history-db', default=os.environ.get('HISTORY_DB', history_db),
+                        help='SQLite run history path, one row per run, empty disables (or set HISTORY_DB); '
+                             'see python run_history.py stats')
+    parser.add_argument('--metrics-file', default=os.environ.get('METRICS_FILE', metrics_file),
+                        help='Write run metrics to this file at exit, replaced atomically, e.g. into the '
+                             'node_exporter textfile directory (or set METRICS_FILE)')
+    parser.add_argument('--metrics-format', choices=['prometheus', 'openmetrics'],
+                        default=os.environ.get('METRICS_FORMAT', metrics_format),
+                        help='Exposition format of --metrics-file: Prometheus text format (default, what the '
+                             'node_exporter textfile collector parses) or OpenMetrics (or set METRICS_FORMAT)')
     args = parser.parse_args()
+    answer_db = args.answer_db
+    history_db = args.history_db
+    metrics_file = args.metrics_file
+    metrics_format = args.metrics_format
+    request_log = args.request_log
+    trace_file = args.trace
+    profile_enabled = args.profile or os.environ.get('PROFILE') == '1'
+    profile_top = args.profile_top
+    fuzzy_threshold = args.fuzzy_threshold
+    answer_strategies = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in answer_strategies if name not in ANSWER_STRATEGIES]
+    if unknown:
+        parser.error(f"unknown answer strategies: {', '.join(unknown)}")
+    route_confidence = args.route_confidence
+    route_auto_order = not args.no_auto_order and os.environ.get('ROUTE_AUTO_ORDER') != '0'
+    if args.parser:
+        select_backend(args.parser)
+    reuse_cookies = args.reuse_cookies or os.environ.get('REUSE_COOKIES') == '1'
+    api_timeout = args.api_timeout
+    answer_budget = args.answer_budget
+    hedge_enabled = args.hedge or os.environ.get('API_HEDGE') == '1'
+    hedge_percentile = args.hedge_percentile
+    api_stream = args.stream or os.environ.get('API_STREAM') == '1'
+    ensemble_apps = [app.strip() for app in args.ensemble_apps.split(',') if app.strip()]
+    ensemble_grace = args.ensemble_grace
     
     # 配置加载
     try:
@@ -902,14 +1612,132 @@ def main():
     except KeyError as e:
         raise Exception(f"Missing required configuration: {e}")
 
+    started = time.time()
+    status, error = 'success', None
     try:
-        merge(local=args.local)
+        with tracing.span("merge"):
+            if profile_enabled:
+                profiling.profile_call(merge, local=args.local, reuse_cookies=reuse_cookies, top=profile_top)
+            else:
+                merge(local=args.local, reuse_cookies=reuse_cookies)
         sendPushplus('成功')
     except Exception as e:
         print(f"任务执行失败: {e}")
+        status, error = 'failure', str(e)
         # 保存失败时的响应到本地
         save_failure_response(str(e))
         sendPushplus('失败')
+    finally:
+        run = collect_run_metrics(started, time.time(), status, error)
+        record_run_history(run)
+        write_run_metrics(run)
+        if trace_file:
+            try:
+                print(f"[调试] 追踪数据已保存到: {', '.join(tracing.export(trace_file))}")
+            except Exception as e:
+                print(f"[警告] 导出追踪数据失败: {e}")
+
+def collect_run_metrics(started, finished, status, error=None):
+    """汇总本次运行的统计，用于运行历史"""
+    run = {
+        "user": username,
+        "started": datetime.fromtimestamp(started).strftime("%Y-%m-%d %H:%M:%S"),
+        "finished": datetime.fromtimestamp(finished).strftime("%Y-%m-%d %H:%M:%S"),
+        "duration": round(finished - started, 3),
+        "status": status,
+        "error": error,
+        "api_calls": len(api_calls),
+        "api_latency": sum(call["latency"] for call in api_calls) / len(api_calls) if api_calls else None,
+        "correct": question_stats["correct"],
+        "wrong": question_stats["wrong"],
+        "money_initial": money_stats["initial"],
+        "money_final": money_stats["final"],
+    }
+    if current_session is not None:
+        session = current_session.session
+        run.update({
+            "steps": {step: round(seconds, 3) for step, seconds in current_session.step_durations.items()},
+            "requests": len(session.events),
+            # 线上字节数只统计已知的响应，全部未知时记为NULL
+            "wire_bytes": sum(event["wire"] for event in session.events if event["wire"] is not None)
+                          if any(event["wire"] is not None for event in session.events) else None,
+            "decoded_bytes": sum(event["decoded"] or 0 for event in session.events),
+            "cache_hits": session.cache_hits,
+            "cache_misses": session.cache_misses,
+        })
+    return run
+
+def record_run_history(run):
+    """把本次运行追加到运行历史数据库"""
+    if not history_db:
+        return
+    try:
+        history = RunHistory(history_db)
+        try:
+            history.record(run)
+        finally:
+            history.close()
+        print(f"[调试] 运行记录已保存到: {history_db}")
+    except Exception as e:
+        print(f"[警告] 保存运行记录失败: {e}")
+
+def write_run_metrics(run):
+    """把本次运行的指标写成Prometheus（或OpenMetrics）文本文件"""
+    if not metrics_file:
+        return
+    events = current_session.events if current_session is not None else []
+    request_latencies = {}
+    request_counts = {}
+    for event in events:
+        request_latencies.setdefault((("step", event["step"] or ""),), []).append(event["total"])
+        key = (event["step"] or "", str(event["status"]) if event["status"] is not None else "error")
+        request_counts[key] = request_counts.get(key, 0) + 1
+    llm_latencies = {}
+    for call in api_calls:
+        llm_latencies.setdefault((("outcome", call["outcome"]),), []).append(call["latency"])
+    attempts = {}
+    for span in tracing.spans:
+        attempts[span[0]] = attempts.get(span[0], 0) + 1
+    wins = answer_router.wins if answer_router is not None else {}
+    transfer = current_session.session.transfer_stats if current_session is not None else {}
+
+    families = [
+        metrics_export.histogram("mission_http_request_duration_seconds", "HTTP request latency by step",
+                                 request_latencies, metrics_export.REQUEST_BUCKETS),
+        metrics_export.counter("mission_http_requests", "HTTP requests by step and status",
+                               [({"step": step, "status": status}, count)
+                                for (step, status), count in sorted(request_counts.items())]),
+        # 线上字节数未知的响应不计入字节数，单独计数
+        metrics_export.counter("mission_http_response_bytes", "Response body bytes with known wire size",
+                               [({"encoding": encoding, "kind": kind}, stats[kind])
+                                for encoding, stats in sorted(transfer.items()) for kind in ("wire", "decoded")]),
+        metrics_export.counter("mission_http_response_size_unknown", "Responses whose wire size is unknown",
+                               [({"encoding": encoding}, stats["unknown"]) for encoding, stats in sorted(transfer.items())]),
+        metrics_export.counter("mission_verify_attempts", "Verification attempts",
+                               [({}, attempts.get("verify_attempt", 0))]),
+        metrics_export.counter("mission_login_attempts", "Login attempts",
+                               [({}, attempts.get("login_attempt", 0))]),
+        metrics_export.counter("mission_answer_strategy_wins", "Questions answered by each strategy",
+                               [({"strategy": name}, count) for name, count in sorted(wins.items())]),
+        metrics_export.counter("mission_questions", "Answered questions by result",
+                               [({"result": "correct"}, question_stats["correct"]),
+                                ({"result": "wrong"}, question_stats["wrong"])]),
+        metrics_export.histogram("mission_llm_call_duration_seconds", "LLM call latency by outcome",
+                                 llm_latencies, metrics_export.LLM_BUCKETS),
+        metrics_export.gauge("mission_money_delta", "Money change during the run",
+                             [({}, money_stats["final"] - money_stats["initial"])]),
+        metrics_export.gauge("mission_run_duration_seconds", "Wall time of the run",
+                             [({}, run["duration"])], unit="seconds"),
+        metrics_export.gauge("mission_run_success", "1 if the run succeeded",
+                             [({}, run["status"] == 'success')]),
+        metrics_export.gauge("mission_run_timestamp_seconds", "Unix time the run finished",
+                             [({}, time.time())], unit="seconds"),
+    ]
+    try:
+        metrics_export.write_textfile(metrics_file, families, openmetrics=metrics_format == 'openmetrics')
+        print(f"[调试] 运行指标已保存到: {metrics_file}")
+    except Exception as e:
+        print(f"[警告] 保存运行指标失败: {e}")
 
 def save_failure_response(error_msg):
     """任务失败时保存相关信息到本地"""
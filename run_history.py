@@ -0,0 +1,142 @@
+"""
+    运行历史：
+    每次运行结束（成功或失败）向SQLite追加一行：开始/结束时间、各步骤耗时、请求数和字节数、
+    大模型调用次数和平均耗时、答题和金钱统计、页面缓存命中和最终状态
+
+    查看最近若干次运行的各步骤耗时p50/p95和成功率：
+    python run_history.py stats --last 30
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+# 记录的字段，steps为JSON（步骤 -> 秒）
+COLUMNS = (
+    'user', 'started', 'finished', 'duration', 'status', 'error', 'steps',
+    'requests', 'wire_bytes', 'decoded_bytes', 'api_calls', 'api_latency',
+    'correct', 'wrong', 'money_initial', 'money_final', 'cache_hits', 'cache_misses',
+)
+INSERT_SQL = f"INSERT INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join(':' + name for name in COLUMNS)})"
+
+
+def percentile(values, pct):
+    """最近秩法分位数，values为空时返回None"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(0, int(round(pct / 100 * len(values))) - 1)
+    return values[min(rank, len(values) - 1)]
+
+
+class RunHistory:
+    """基于SQLite的运行历史"""
+
+    def __init__(self, path='run_history.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT,
+                started TEXT NOT NULL,
+                finished TEXT NOT NULL,
+                duration REAL NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                steps TEXT NOT NULL DEFAULT '{}',
+                requests INTEGER,
+                wire_bytes INTEGER,
+                decoded_bytes INTEGER,
+                api_calls INTEGER,
+                api_latency REAL,
+                correct INTEGER,
+                wrong INTEGER,
+                money_initial INTEGER,
+                money_final INTEGER,
+                cache_hits INTEGER,
+                cache_misses INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started)")
+        self.conn.commit()
+
+    def record(self, run):
+        """追加一次运行，run为字段名 -> 值，缺少的字段记为NULL"""
+        row = {name: run.get(name) for name in COLUMNS}
+        row['steps'] = json.dumps(run.get('steps') or {}, ensure_ascii=False)
+        self.conn.execute(INSERT_SQL, row)
+        self.conn.commit()
+
+    def recent(self, last=30, user=None):
+        """最近last次运行（从旧到新），每行为字段名 -> 值"""
+        query = f"SELECT {', '.join(COLUMNS)} FROM runs"
+        params = []
+        if user:
+            query += " WHERE user = ?"
+            params.append(user)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(last)
+        runs = []
+        for values in reversed(self.conn.execute(query, params).fetchall()):
+            run = dict(zip(COLUMNS, values))
+            run['steps'] = json.loads(run['steps'] or '{}')
+            runs.append(run)
+        return runs
+
+    def stats(self, last=30, user=None):
+        """最近last次运行的成功率，以及总耗时和各步骤耗时的p50/p95"""
+        runs = self.recent(last, user)
+        steps = {}
+        for run in runs:
+            for step, seconds in run['steps'].items():
+                steps.setdefault(step, []).append(seconds)
+        durations = [run['duration'] for run in runs]
+        api_latencies = [run['api_latency'] for run in runs if run['api_latency'] is not None]
+        return {
+            "runs": len(runs),
+            "success": sum(1 for run in runs if run['status'] == 'success'),
+            "duration": (percentile(durations, 50), percentile(durations, 95)),
+            "steps": {step: (percentile(values, 50), percentile(values, 95), len(values))
+                      for step, values in steps.items()},
+            "requests": sum(run['requests'] or 0 for run in runs) / len(runs) if runs else 0,
+            "api_latency": (percentile(api_latencies, 50), percentile(api_latencies, 95)),
+            "correct": sum(run['correct'] or 0 for run in runs),
+            "wrong": sum(run['wrong'] or 0 for run in runs),
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def print_stats(stats):
+    if not stats["runs"]:
+        print("没有运行记录")
+        return
+    print(f"最近 {stats['runs']} 次运行：成功 {stats['success']} 次（{stats['success'] / stats['runs']:.0%}），"
+          f"平均每次 {stats['requests']:.1f} 个请求，答对 {stats['correct']} 题，答错 {stats['wrong']} 题")
+    print(f"{'步骤':<12}{'次数':>6}{'p50(秒)':>10}{'p95(秒)':>10}")
+    print(f"{'total':<12}{stats['runs']:>6}{stats['duration'][0]:>10.1f}{stats['duration'][1]:>10.1f}")
+    for step, (p50, p95, count) in sorted(stats["steps"].items(), key=lambda item: -item[1][1]):
+        print(f"{step:<12}{count:>6}{p50:>10.1f}{p95:>10.1f}")
+    if stats["api_latency"][0] is not None:
+        print(f"{'api':<12}{'':>6}{stats['api_latency'][0]:>10.1f}{stats['api_latency'][1]:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default=os.environ.get('HISTORY_DB', 'run_history.db'), help='SQLite run history path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats_parser = subparsers.add_parser('stats', help='Rolling p50/p95 step latencies and success rate')
+    stats_parser.add_argument('--last', type=int, default=30, help='number of most recent runs to include')
+    stats_parser.add_argument('--user', help='only include runs of this user')
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    if args.command == 'stats':
+        print_stats(history.stats(args.last, args.user))
+    history.close()
+
+
+if __name__ == '__main__':
+    main()
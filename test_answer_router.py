@@ -0,0 +1,44 @@
+from answer_router import AnswerRouter, MIN_SAMPLES
+
+
+def make_router(order):
+    strategies = {name: (lambda context: (None, 0.0)) for name in order}
+    return AnswerRouter(strategies, order, confidence=0.9)
+
+
+def add_samples(router, name, latency, correct, count=MIN_SAMPLES):
+    stats = router.stats[name]
+    for _ in range(count):
+        stats.latencies.append(latency)
+        stats.outcomes.append(1 if correct else 0)
+
+
+def test_sample_poor_strategies_keep_configured_position():
+    router = make_router(['exact', 'llm'])
+    add_samples(router, 'exact', 0.001, True)
+    assert router.effective_order() == ['exact', 'llm']
+
+
+def test_reorder_only_among_strategies_with_samples():
+    router = make_router(['exact', 'fuzzy', 'elimination', 'warm', 'ranker', 'llm'])
+    # fuzzy准确率不达标，ranker达标且很快：两者交换位置，其余样本不足的策略不动
+    add_samples(router, 'exact', 0.002, True)
+    add_samples(router, 'fuzzy', 0.010, False)
+    add_samples(router, 'ranker', 0.005, True)
+    assert router.effective_order() == ['exact', 'ranker', 'elimination', 'warm', 'fuzzy', 'llm']
+
+
+def test_accurate_strategies_ordered_by_latency():
+    router = make_router(['exact', 'fuzzy', 'llm'])
+    add_samples(router, 'exact', 0.020, True)
+    add_samples(router, 'fuzzy', 0.005, True)
+    add_samples(router, 'llm', 8.0, True)
+    assert router.effective_order() == ['fuzzy', 'exact', 'llm']
+
+
+def test_no_auto_order_keeps_configuration():
+    router = make_router(['exact', 'fuzzy'])
+    router.auto_order = False
+    add_samples(router, 'fuzzy', 0.001, True)
+    add_samples(router, 'exact', 0.5, True)
+    assert router.effective_order() == ['exact', 'fuzzy']
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from answer_store import AnswerStore, import_corpus, iter_json_entries
+
+
+def test_record_does_not_copy_near_duplicate_answers(tmp_path):
+    store = AnswerStore(str(tmp_path / 'answers.db'), fuzzy_threshold=0.8)
+    options = {"a1": "北京", "a2": "上海", "a3": "广州", "a4": "南京"}
+    store.record("以下哪一个城市是中华人民共和国的首都", options, "a1", True)
+    # 两道题相似度约0.84，答案正好相反
+    negated = "以下哪一个城市不是中华人民共和国的首都"
+    store.record(negated, options, "a3", False)
+
+    assert store.get(negated, options, fuzzy=False) == {"correct": None, "wrong": ["a3"]}
+    assert store.lookup(negated, options, fuzzy=False) is None
+    store.close()
+
+
+def test_background_index_includes_rows_recorded_during_build(tmp_path):
+    path = str(tmp_path / 'answers.db')
+    store = AnswerStore(path, fuzzy_threshold=0.8)
+    options = {"a1": "北京", "a2": "上海", "a3": "广州", "a4": "南京"}
+    store.record("以下哪一个城市是中华人民共和国的首都", options, "a1", True)
+    store.build_index_async()
+    store.record("下列哪个城市是中国人口最多的城市", options, "a2", True)
+    store.index_thread.join()
+
+    assert store.lookup_fuzzy("以下哪一个城市是中华人民共和国的首都？", options)[0] == "a1"
+    assert store.lookup_fuzzy("下列哪个城市是中国人口最多的城市？", options)[0] == "a2"
+    store.close()
+
+
+def test_api_latencies_persist_across_runs(tmp_path):
+    path = str(tmp_path / 'answers.db')
+    store = AnswerStore(path)
+    for latency in (3.0, 4.0, 5.0):
+        store.record_latency("app", latency)
+    store.record_latency("other", 60.0)
+    store.close()
+
+    store = AnswerStore(path)
+    assert store.recent_latencies("app") == [5.0, 4.0, 3.0]
+    assert store.recent_latencies("app", window=2) == [5.0, 4.0]
+    store.close()
+
+
+def test_fuzzy_lookup_skips_negated_question(tmp_path):
+    store = AnswerStore(str(tmp_path / 'answers.db'), fuzzy_threshold=0.8)
+    options = {"a1": "北京", "a2": "上海", "a3": "广州", "a4": "南京"}
+    store.record("以下哪一个城市是中华人民共和国的首都", options, "a1", True)
+
+    assert store.lookup_fuzzy("以下哪一个城市不是中华人民共和国的首都", options) == (None, 0.0)
+    assert store.lookup("以下哪一个城市不是中华人民共和国的首都", options) is None
+    assert store.lookup_fuzzy("以下哪一个城市是中华人民共和国的首都？", options)[0] == "a1"
+    store.close()
+
+
+def test_iter_json_entries_stops_at_oversized_entry(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    path.write_text('{"question": "题一"}\n{"question": "' + 'x' * 5000, encoding='utf-8')
+    entries = iter_json_entries(str(path), chunk_size=64, max_entry_size=1000)
+
+    assert next(entries) == {"question": "题一"}
+    with pytest.raises(ValueError, match="字节偏移 23 "):
+        next(entries)
+
+
+def test_import_keeps_confirmed_answer(tmp_path):
+    store = AnswerStore(str(tmp_path / 'answers.db'))
+    options = {"a1": "北京", "a2": "上海", "a3": "广州", "a4": "南京"}
+    store.record("中华人民共和国的首都是哪里", options, "a1", True)
+    corpus = tmp_path / 'corpus.jsonl'
+    corpus.write_text(json.dumps({"question": "中华人民共和国的首都是哪里", "options": options,
+                                  "correct_answer": "a2", "wrong_answer": "a1"}, ensure_ascii=False),
+                      encoding='utf-8')
+    stats = import_corpus(store, str(corpus))
+
+    assert stats["conflicts"] == 1
+    assert store.get("中华人民共和国的首都是哪里", options, fuzzy=False) == {"correct": "a1", "wrong": []}
+    store.close()
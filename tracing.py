@@ -0,0 +1,121 @@
+"""
+    运行过程追踪：
+    用span()包住各个步骤、重试、答题、大模型调用和等待，记录嵌套的开始/结束时间，运行结束后导出：
+    - Chrome trace-event JSON：在chrome://tracing、Perfetto（ui.perfetto.dev）或speedscope中直接打开
+    - folded stack文本：每行“外层;内层;... 自身耗时(微秒)”，可直接交给flamegraph.pl / inferno / speedscope
+
+        with tracing.span("question"):
+            ...
+        tracing.export("trace.json")   # 同时写出trace.folded
+
+    嵌套关系按线程分别记录，后台线程（如大模型调用）的span在trace中显示为单独的一行
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# 已结束的span：(名称, 线程id, 开始, 结束, 调用栈路径, 参数)，时间为perf_counter秒
+spans = []
+# 各线程当前打开的span名称
+_local = threading.local()
+_lock = threading.Lock()
+# trace中的时间从第一次导入本模块开始计算
+_origin = time.perf_counter()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def span(name, **args):
+    """记录一段耗时，args会显示在Chrome trace的详情中"""
+    stack = _stack()
+    stack.append(name)
+    path = tuple(stack)
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        with _lock:
+            spans.append((name, threading.get_ident(), start, end, path, args))
+
+
+def traced(name=None):
+    """装饰器：每次调用函数记录一个span，默认以函数名命名"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sleep(seconds, reason="sleep"):
+    """time.sleep，并把等待时间记为一个span"""
+    with span(reason, seconds=seconds):
+        time.sleep(seconds)
+
+
+def chrome_trace():
+    """转换为Chrome trace-event格式（完整事件ph=X，时间单位微秒）"""
+    with _lock:
+        recorded = list(spans)
+    threads = {}
+    events = []
+    for name, thread, start, end, path, args in sorted(recorded, key=lambda item: item[2]):
+        tid = threads.setdefault(thread, len(threads) + 1)
+        events.append({
+            "name": name,
+            "cat": path[0],
+            "ph": "X",
+            "pid": os.getpid(),
+            "tid": tid,
+            "ts": round((start - _origin) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "args": {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                     for key, value in args.items()},
+        })
+    for thread, tid in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                       "args": {"name": "main" if thread == threading.main_thread().ident else f"worker-{tid}"}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def folded_stacks():
+    """转换为folded stack文本：同一调用路径的自身耗时（扣除子span）累加，单位微秒"""
+    with _lock:
+        recorded = list(spans)
+    totals = {}
+    children = {}
+    for name, thread, start, end, path, args in recorded:
+        key = (thread, path)
+        totals[key] = totals.get(key, 0.0) + (end - start)
+        if len(path) > 1:
+            parent = (thread, path[:-1])
+            children[parent] = children.get(parent, 0.0) + (end - start)
+    folded = {}
+    for (thread, path), total in totals.items():
+        self_time = max(0.0, total - children.get((thread, path), 0.0))
+        stack = ";".join(part.replace(";", ",").replace(" ", "_") for part in path)
+        folded[stack] = folded.get(stack, 0) + round(self_time * 1e6)
+    return "".join(f"{stack} {value}\n" for stack, value in sorted(folded.items()) if value > 0)
+
+
+def export(path):
+    """写出Chrome trace JSON到path，folded stack写到同名的.folded文件，返回两个文件名"""
+    folded_path = os.path.splitext(path)[0] + ".folded"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f, ensure_ascii=False)
+    with open(folded_path, 'w', encoding='utf-8') as f:
+        f.write(folded_stacks())
+    return path, folded_path
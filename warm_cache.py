@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dashscope import Application
+from answer_store import AnswerStore
+
+"""
+    答案缓存预热：
+    每天答题时逐题调用大模型，大模型慢的时候整个任务都要等；
+    预热任务离线把题目文件（wrong.json，或收集到的相同格式的题目）批量发给大模型，
+    答案作为“预答”写入答案库，答题时直接使用，答错后自动作废
+
+    并发数有上限，请求速率用令牌桶限制，避免触发DashScope的限流：
+    python warm_cache.py wrong.json --concurrency 4 --rate 2
+    凭据取环境变量API_KEY/APP_ID，或加--local读取config.json
+"""
+
+LABEL_RE = re.compile(r'\ba[1-4]\b')
+
+
+class TokenBucket:
+    """令牌桶：每秒补充rate个令牌，最多攒capacity个，取不到令牌时等待"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_prompt(question_text, options_dict, exclude=()):
+    """与答题脚本相同格式的提示词，已知错误的选项不发给大模型"""
+    options = [f"{k}: {v}" for k, v in sorted(options_dict.items()) if k not in exclude]
+    option_ids = "、".join(k for k in sorted(options_dict) if k not in exclude)
+    return f"题目: {question_text}\n选项:\n" + "\n".join(options) + f"\n请选择正确答案，只返回选项ID（如{option_ids}）："
+
+
+def load_questions(path):
+    """读取题目文件，返回[(题目, 选项字典, 已知错误选项ID或None)]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    questions = []
+    for entry in entries:
+        question_text = entry.get("question")
+        options_dict = entry.get("options") or {}
+        if question_text and len(options_dict) > 1:
+            questions.append((question_text, options_dict, entry.get("wrong_answer")))
+    return questions
+
+
+def ask(api_key, app_id, bucket, prompt):
+    """调用一次大模型，返回(标签, 耗时)"""
+    bucket.acquire()
+    start_time = time.time()
+    response = Application.call(api_key=api_key, app_id=app_id, prompt=prompt)
+    if response.status_code != 200:
+        raise Exception(f"{response.code}: {response.message}")
+    match = LABEL_RE.search(response.output.text or '')
+    return (match.group(0) if match else None), time.time() - start_time
+
+
+def warm(store, questions, api_key, app_id, concurrency, rate, force=False):
+    start_time = time.time()
+    bucket = TokenBucket(rate, capacity=max(1, concurrency))
+    stats = {"answered": 0, "failed": 0, "skipped": 0, "latency": 0.0}
+
+    # 先写入题目文件中的错误答案，已有确认答案或预答的题目跳过
+    tasks = {}
+    for question_text, options_dict, wrong_label in questions:
+        if wrong_label in options_dict:
+            store.record(question_text, options_dict, wrong_label, False, commit=False)
+        if not force and not store.needs_answer(question_text, options_dict):
+            stats["skipped"] += 1
+            continue
+        entry = store.get(question_text, options_dict, fuzzy=False)
+        known_wrong = entry["wrong"] if entry else []
+        if len(known_wrong) >= len(options_dict) - 1:
+            # 排除法已能确定答案（或记录有误），不需要大模型
+            stats["skipped"] += 1
+            continue
+        prompt = build_prompt(question_text, options_dict, known_wrong)
+        tasks[prompt] = (question_text, options_dict, known_wrong)
+    store.conn.commit()
+    print(f"[调试] 待预热 {len(tasks)} 道题，跳过 {stats['skipped']} 道，并发 {concurrency}，速率 {rate}/秒")
+
+    # 调用在线程池中并发执行，SQLite只在主线程写入
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(ask, api_key, app_id, bucket, prompt): prompt for prompt in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            question_text, options_dict, known_wrong = tasks[futures[future]]
+            try:
+                label, latency = future.result()
+            except Exception as e:
+                print(f"[警告] 预热失败: {question_text[:30]}: {e}")
+                stats["failed"] += 1
+                continue
+            if label not in options_dict or label in known_wrong:
+                print(f"[警告] 大模型返回无效答案 {label}: {question_text[:30]}")
+                stats["failed"] += 1
+                continue
+            store.suggest(question_text, options_dict, label, commit=False)
+            stats["answered"] += 1
+            stats["latency"] += latency
+            if done % 50 == 0:
+                store.conn.commit()
+                print(f"[调试] 已完成 {done}/{len(tasks)}")
+    store.conn.commit()
+
+    elapsed = time.time() - start_time
+    average = stats["latency"] / stats["answered"] if stats["answered"] else 0
+    print(f"预热完成：预答{stats['answered']}道，失败{stats['failed']}道，跳过{stats['skipped']}道，"
+          f"总耗时{elapsed:.1f}秒，单次调用平均{average:.1f}秒")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-answer questions with the LLM and store them in the answer cache')
+    parser.add_argument('files', nargs='+', help='wrong.json or a question corpus in the same shape')
+    parser.add_argument('--db', default=os.environ.get('ANSWER_DB', 'answers.db'), help='SQLite answer cache path')
+    parser.add_argument('--concurrency', type=int, default=4, help='maximum LLM calls in flight')
+    parser.add_argument('--rate', type=float, default=2, help='maximum LLM calls started per second')
+    parser.add_argument('--force', action='store_true', help='re-ask questions that already have a suggestion')
+    parser.add_argument('--local', action='store_true', help='Use local config')
+    args = parser.parse_args()
+
+    if args.local:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(base_dir, "config.json"), 'r') as f:
+            config = json.load(f)
+        api_key, app_id = config['API_KEY'], config['APP_ID']
+    else:
+        api_key, app_id = os.environ['API_KEY'], os.environ['APP_ID']
+
+    questions = []
+    for path in args.files:
+        questions.extend(load_questions(path))
+    store = AnswerStore(args.db)
+    try:
+        warm(store, questions, api_key, app_id, args.concurrency, args.rate, args.force)
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()